@@ -18,6 +18,8 @@ class Settings(BaseSettings):
     supabase_url: str = os.getenv('SUPABASE_URL', '')
     supabase_service_key: str = os.getenv('SUPABASE_SERVICE_KEY', '')
     supabase_anon_key: str = os.getenv('SUPABASE_ANON_KEY', '')
+    # Verifies user access tokens, e.g. to rate limit per school; empty to skip
+    supabase_jwt_secret: str = os.getenv('SUPABASE_JWT_SECRET', '')
     
     # SendGrid
     sendgrid_api_key: str = os.getenv('SENDGRID_API_KEY', '')
@@ -31,7 +33,51 @@ class Settings(BaseSettings):
     # Storage
     storage_bucket_name: str = os.getenv('STORAGE_BUCKET_NAME', 'exam-pdfs')
     signed_url_expiration_seconds: int = 3600  # 1 hour
-    
+
+    # Audit event stream
+    audit_stream_buffer_size: int = int(os.getenv('AUDIT_STREAM_BUFFER_SIZE', '256'))  # per subscriber
+    audit_stream_replay_size: int = int(os.getenv('AUDIT_STREAM_REPLAY_SIZE', '1000'))
+    audit_stream_keepalive_seconds: int = 15
+    # Postgres connection string for cross-worker delivery; empty for in-process only
+    audit_stream_database_url: str = os.getenv('AUDIT_STREAM_DATABASE_URL', '')
+    audit_stream_channel: str = 'audit_events'
+    audit_stream_publish_timeout_seconds: float = 0.5  # audit writes never wait longer on the stream
+
+    # Recent activity buffer
+    recent_activity_size: int = 50  # events kept per school
+    recent_activity_warm_rows: int = 10000  # rows read at startup
+
+    # Audit log tiering (off unless enabled; archived months must go to a bucket)
+    audit_archive_enabled: bool = os.getenv('AUDIT_ARCHIVE_ENABLED', 'false').lower() == 'true'
+    audit_hot_months: int = int(os.getenv('AUDIT_HOT_MONTHS', '3'))  # months kept in audit_logs
+    audit_archive_dir: str = os.getenv('AUDIT_ARCHIVE_DIR', str(ROOT_DIR / 'archive'))
+    audit_archive_bucket: str = os.getenv('AUDIT_ARCHIVE_BUCKET', '')  # empty for local only
+    audit_archive_interval_hours: int = 24
+    # Postgres connection string; when set, an advisory lock lets only one host archive
+    database_url: str = os.getenv('DATABASE_URL', '')
+
+    # Audit event coalescing
+    audit_coalesce_window_seconds: int = int(os.getenv('AUDIT_COALESCE_WINDOW_SECONDS', '300'))  # 0 disables
+    audit_coalesce_actions: str = os.getenv('AUDIT_COALESCE_ACTIONS', 'view')  # comma separated
+    audit_coalesce_max_keys: int = 10000
+
+    # Dashboard
+    dashboard_section_timeout_seconds: float = 2.0
+    dashboard_cache_max_entries: int = 5000
+
+    # Admission control (requests per minute per school, burst = one minute)
+    rate_limit_default_per_minute: int = int(os.getenv('RATE_LIMIT_DEFAULT_PER_MINUTE', '600'))
+    rate_limit_heavy_per_minute: int = int(os.getenv('RATE_LIMIT_HEAVY_PER_MINUTE', '30'))
+    heavy_max_concurrency: int = int(os.getenv('HEAVY_MAX_CONCURRENCY', '4'))  # per worker
+    # Reverse proxies in front of the API; used to find the caller in X-Forwarded-For
+    forwarded_proxy_hops: int = int(os.getenv('FORWARDED_PROXY_HOPS', '0'))
+
+    # Profiling (debug endpoints are disabled while the token is empty)
+    debug_token: str = os.getenv('DEBUG_TOKEN', '')
+    profiling_sample_rate: float = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    slow_request_threshold_ms: int = int(os.getenv('SLOW_REQUEST_THRESHOLD_MS', '0'))  # 0 disables
+    slow_request_store_size: int = 100
+
     class Config:
         env_file = '.env'
 
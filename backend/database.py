@@ -1,6 +1,8 @@
 from supabase import create_client, Client
 from config import settings
+from utils.profiling import instrument_client
 import logging
+from typing import Optional, Dict, Any, Callable, Iterator, List
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +14,7 @@ def get_supabase_client() -> Client:
             settings.supabase_url,
             settings.supabase_service_key  # Use service role key for backend
         )
+        instrument_client(supabase)
         return supabase
     except Exception as e:
         logger.error(f"Failed to create Supabase client: {str(e)}")
@@ -26,3 +29,31 @@ def get_db() -> Client:
     if supabase_client is None:
         supabase_client = get_supabase_client()
     return supabase_client
+
+# PostgREST silently cuts responses off at its max-rows setting
+PAGE_SIZE = 1000
+
+def iter_pages(
+    query: Callable[[Optional[Dict[str, Any]]], Any],
+    page_size: int = PAGE_SIZE
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the rows of a large read one page at a time.
+
+    query(last_row) builds the request for the page after last_row, or the
+    first page when last_row is None. Continuing from the last row (keyset
+    paging) instead of an offset keeps later pages as cheap as the first.
+    """
+    last_row = None
+    while True:
+        rows = query(last_row).limit(page_size).execute().data
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_row = rows[-1]
+
+def newest_first_after(query, created_at: str, row_id: str):
+    """Keyset filter for rows ordered by created_at DESC, id DESC"""
+    return query.or_(
+        f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})'
+    )
@@ -63,6 +63,10 @@ class SystemConfigUpdate(BaseModel):
     config_value: Dict[str, Any]
     description: Optional[str] = None
 
+class ProfilingConfigUpdate(BaseModel):
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+    slow_threshold_ms: Optional[int] = Field(None, ge=0)
+
 # Response Models
 class AuditLog(BaseModel):
     id: str
@@ -1,12 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, Header
+from fastapi import APIRouter, HTTPException, Depends, Request, Header, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
 from models import (
     AuditLogCreate, AuditLog, APIResponse,
     ActionType, ResourceType
 )
-from database import get_db
+from database import get_db, newest_first_after
 from utils.audit_logger import AuditLogger
+from utils.event_hub import audit_event_hub
+from utils.recent_activity import recent_activity
+from utils.audit_archive import audit_archive, AUDIT_LOG_SCHEMA, parse_timestamp
+from config import settings
+import base64
+import json
 import logging
+import uuid
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -48,8 +56,23 @@ async def create_audit_log(
         logger.error(f"Error in create_audit_log: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _apply_log_filters(query, filters, start_date, end_date):
+    """Apply the /logs filters to a hot-table query"""
+    for field, value in filters.items():
+        if value:
+            query = query.eq(field, value)
+    if start_date:
+        query = query.gte('created_at', start_date)
+    if end_date:
+        query = query.lte('created_at', end_date)
+    return query
+
+def _count_hot_logs(db, filters, start_date, end_date) -> int:
+    query = db.table('audit_logs').select('id', count='exact', head=True)
+    return _apply_log_filters(query, filters, start_date, end_date).execute().count or 0
+
 @router.get("/logs", response_model=APIResponse)
-async def get_audit_logs(
+def get_audit_logs(
     school_id: Optional[str] = None,
     user_id: Optional[str] = None,
     action_type: Optional[str] = None,
@@ -62,21 +85,15 @@ async def get_audit_logs(
     """Get audit logs with filters"""
     try:
         db = get_db()
-        query = db.table('audit_logs').select('*')
+        query = db.table('audit_logs').select(', '.join(AUDIT_LOG_SCHEMA.names))
         
-        # Apply filters
-        if school_id:
-            query = query.eq('school_id', school_id)
-        if user_id:
-            query = query.eq('user_id', user_id)
-        if action_type:
-            query = query.eq('action_type', action_type)
-        if resource_type:
-            query = query.eq('resource_type', resource_type)
-        if start_date:
-            query = query.gte('created_at', start_date)
-        if end_date:
-            query = query.lte('created_at', end_date)
+        filters = {
+            "school_id": school_id,
+            "user_id": user_id,
+            "action_type": action_type,
+            "resource_type": resource_type
+        }
+        query = _apply_log_filters(query, filters, start_date, end_date)
         
         # Order by created_at descending
         query = query.order('created_at', desc=True)
@@ -85,19 +102,124 @@ async def get_audit_logs(
         query = query.range(offset, offset + limit - 1)
         
         result = query.execute()
+        logs = result.data
+        
+        # Archived rows are all older than hot rows, so they continue the page
+        if len(logs) < limit and audit_archive.months(db):
+            if logs:
+                hot_total = offset + len(logs)
+            else:
+                hot_total = _count_hot_logs(db, filters, start_date, end_date)
+            logs += audit_archive.get_logs(
+                db, filters, start_date, end_date,
+                limit=limit - len(logs),
+                offset=max(0, offset - hot_total)
+            )
         
         return APIResponse(
             success=True,
-            data=result.data,
-            message=f"Retrieved {len(result.data)} audit logs"
+            data=logs,
+            message=f"Retrieved {len(logs)} audit logs"
         )
         
     except Exception as e:
         logger.error(f"Error in get_audit_logs: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# PostgREST returns at most 1000 rows per request
+SEARCH_MAX_LIMIT = 1000
+
+def _encode_cursor(row) -> str:
+    return base64.urlsafe_b64encode(json.dumps([row['created_at'], row['id']]).encode()).decode()
+
+def _decode_cursor(cursor: str):
+    """Decode and validate a cursor; its values end up inside a PostgREST filter"""
+    try:
+        created_at, log_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return parse_timestamp(created_at).isoformat(), str(uuid.UUID(log_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+@router.get("/search", response_model=APIResponse)
+def search_audit_logs(
+    q: str,
+    school_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    action_type: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=SEARCH_MAX_LIMIT)
+):
+    """Search audit logs by substring of user email, resource name or details"""
+    try:
+        q = q.strip()
+        # Shorter terms cannot use the trigram index
+        if len(q) < 3:
+            raise HTTPException(status_code=400, detail="Search term must be at least 3 characters")
+        
+        before = _decode_cursor(cursor) if cursor else None
+        filters = {
+            "school_id": school_id,
+            "user_id": user_id,
+            "action_type": action_type,
+            "resource_type": resource_type
+        }
+        
+        db = get_db()
+        query = db.table('audit_logs').select(', '.join(AUDIT_LOG_SCHEMA.names))
+        query = _apply_log_filters(query, filters, None, None)
+        query = query.ilike('search_text', f"%{_escape_like(q.lower())}%")
+        
+        # Keyset paging: continue strictly after the last row of the previous page
+        if before:
+            query = newest_first_after(query, *before)
+        
+        result = query\
+            .order('created_at', desc=True)\
+            .order('id', desc=True)\
+            .limit(limit)\
+            .execute()
+        logs = result.data
+        
+        if len(logs) < limit and audit_archive.months(db):
+            logs += audit_archive.search(db, q, filters, before, limit - len(logs))
+        
+        return APIResponse(
+            success=True,
+            data={
+                "logs": logs,
+                "next_cursor": _encode_cursor(logs[-1]) if len(logs) == limit else None
+            },
+            message=f"Found {len(logs)} audit logs"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in search_audit_logs: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/recent", response_model=APIResponse)
+async def get_recent_activity(school_id: str, limit: int = 50):
+    """Get the newest audit events for a school, served from memory when possible"""
+    try:
+        data = await recent_activity.fetch(get_db(), school_id, limit)
+        
+        return APIResponse(
+            success=True,
+            data=data,
+            message=f"Retrieved {len(data)} recent events"
+        )
+        
+    except Exception as e:
+        logger.error(f"Error in get_recent_activity: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/stats", response_model=APIResponse)
-async def get_audit_stats(
+def get_audit_stats(
     school_id: Optional[str] = None,
     days: int = 30
 ):
@@ -127,6 +249,14 @@ async def get_audit_stats(
             stats["by_action"][action] = stats["by_action"].get(action, 0) + 1
             stats["by_resource"][resource] = stats["by_resource"].get(resource, 0) + 1
         
+        # Fold in archived months
+        cold = audit_archive.count_by(db, ['action_type', 'resource_type'], {"school_id": school_id})
+        for action, count in cold['action_type'].items():
+            stats["by_action"][action] = stats["by_action"].get(action, 0) + count
+            stats["total_logs"] += count
+        for resource, count in cold['resource_type'].items():
+            stats["by_resource"][resource] = stats["by_resource"].get(resource, 0) + count
+        
         return APIResponse(
             success=True,
             data=stats,
@@ -136,3 +266,44 @@ async def get_audit_stats(
     except Exception as e:
         logger.error(f"Error in get_audit_stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stream")
+async def stream_audit_logs(
+    request: Request,
+    school_id: Optional[str] = None,
+    action_type: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """Stream new audit logs as Server-Sent Events"""
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    subscription = audit_event_hub.subscribe(
+        filters={
+            "school_id": school_id,
+            "action_type": action_type,
+            "resource_type": resource_type
+        },
+        last_event_id=resume_from
+    )
+
+    async def event_source():
+        try:
+            while not await request.is_disconnected():
+                event = await subscription.next_event(settings.audit_stream_keepalive_seconds)
+                if event is None:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['event_id']}\nevent: audit\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            audit_event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
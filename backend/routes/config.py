@@ -7,23 +7,25 @@ import logging
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/config", tags=["System Configuration"])
 
+def load_school_config(db, school_id: str, config_key: Optional[str] = None):
+    """Configuration rows for a school, or a single row when config_key is given"""
+    query = db.table('system_config')\
+        .select('*')\
+        .eq('school_id', school_id)
+    
+    if config_key:
+        query = query.eq('config_key', config_key)
+        result = query.single().execute()
+    else:
+        result = query.execute()
+    
+    return result.data
+
 @router.get("/school/{school_id}", response_model=APIResponse)
 async def get_school_config(school_id: str, config_key: Optional[str] = None):
     """Get system configuration for a school"""
     try:
-        db = get_db()
-        
-        query = db.table('system_config')\
-            .select('*')\
-            .eq('school_id', school_id)
-        
-        if config_key:
-            query = query.eq('config_key', config_key)
-            result = query.single().execute()
-            data = result.data
-        else:
-            result = query.execute()
-            data = result.data
+        data = load_school_config(get_db(), school_id, config_key)
         
         return APIResponse(
             success=True,
@@ -0,0 +1,173 @@
+from fastapi import APIRouter, HTTPException
+from typing import Optional, Dict, Any, Awaitable, Callable, Tuple
+from models import APIResponse
+from database import get_db
+from config import settings
+from routes.permissions import load_user_permissions
+from routes.config import load_school_config
+from utils.recent_activity import recent_activity
+import asyncio
+import functools
+import logging
+import time
+from datetime import date
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+# Seconds each section may be served from cache
+SECTION_TTLS = {
+    "stats": 60,
+    "upcoming_exams": 60,
+    "performance": 300,
+    "recent_activity": 5,
+    "config": 300,
+    "permissions": 300,
+}
+
+UPCOMING_EXAMS_LIMIT = 5
+RECENT_ACTIVITY_LIMIT = 10
+
+# (section, school_id, user_id) -> (expires_at, data)
+_cache: Dict[Tuple, Tuple[float, Any]] = {}
+# (section, school_id, user_id) -> refresh in progress
+_refreshing: Dict[Tuple, asyncio.Task] = {}
+
+
+def _load_stats(db, school_id: str) -> Dict[str, int]:
+    today = date.today().isoformat()
+    students = db.table('students')\
+        .select('id', count='exact', head=True)\
+        .eq('school_id', school_id)\
+        .execute()
+    exams = db.table('exams')\
+        .select('id', count='exact', head=True)\
+        .eq('school_id', school_id)\
+        .execute()
+    upcoming = db.table('exams')\
+        .select('id', count='exact', head=True)\
+        .eq('school_id', school_id)\
+        .gte('exam_date', today)\
+        .execute()
+    return {
+        "total_students": students.count or 0,
+        "total_exams": exams.count or 0,
+        "upcoming_exams": upcoming.count or 0
+    }
+
+
+def _load_upcoming_exams(db, school_id: str):
+    result = db.table('exams')\
+        .select('id, name, type, class, section, exam_date, status')\
+        .eq('school_id', school_id)\
+        .gte('exam_date', date.today().isoformat())\
+        .order('exam_date')\
+        .limit(UPCOMING_EXAMS_LIMIT)\
+        .execute()
+    return result.data
+
+
+def _load_performance(db, school_id: str):
+    """Average percentage and student count per class, aggregated in the database"""
+    result = db.rpc('dashboard_class_performance', {'_school_id': school_id}).execute()
+    return [
+        {
+            "class": row['class_name'],
+            "averagePercentage": float(row['average_percentage']),
+            "totalStudents": row['total_students']
+        }
+        for row in result.data
+    ]
+
+
+async def _refresh_section(name: str, key: Tuple, loader: Callable[[], Awaitable[Any]]) -> Any:
+    data = await loader()
+    _cache[key] = (time.monotonic() + SECTION_TTLS[name], data)
+    return data
+
+
+def _refresh_done(key: Tuple, task: asyncio.Task) -> None:
+    if _refreshing.get(key) is task:
+        del _refreshing[key]
+    if not task.cancelled() and task.exception():
+        logger.warning(f"Dashboard section {key[0]} refresh failed: {task.exception()}")
+
+
+async def _load_section(name: str, key: Tuple, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, Optional[str]]:
+    """Return (data, error) for one section, serving stale data if the source fails.
+
+    Only one refresh per cache key runs at a time. A refresh that outlasts
+    the timeout keeps going and fills the cache for later requests.
+    """
+    cached = _cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1], None
+
+    task = _refreshing.get(key)
+    if task is None:
+        task = _refreshing[key] = asyncio.create_task(_refresh_section(name, key, loader))
+        task.add_done_callback(functools.partial(_refresh_done, key))
+
+    try:
+        data = await asyncio.wait_for(
+            asyncio.shield(task),
+            settings.dashboard_section_timeout_seconds
+        )
+        return data, None
+    except asyncio.TimeoutError:
+        error = "timed out"
+    except Exception as e:
+        error = str(e)
+
+    logger.warning(f"Dashboard section {name} unavailable: {error}")
+    return (cached[1] if cached else None), error
+
+
+def _prune_cache() -> None:
+    if len(_cache) <= settings.dashboard_cache_max_entries:
+        return
+    now = time.monotonic()
+    for key in [k for k, (expires_at, _) in _cache.items() if expires_at <= now]:
+        del _cache[key]
+
+
+@router.get("/{school_id}", response_model=APIResponse)
+async def get_dashboard(school_id: str, user_id: Optional[str] = None):
+    """Get everything the dashboard needs in one request"""
+    try:
+        db = get_db()
+        _prune_cache()
+
+        # Supabase calls are blocking, so each section reads on its own thread
+        loaders = {
+            "stats": lambda: asyncio.to_thread(_load_stats, db, school_id),
+            "upcoming_exams": lambda: asyncio.to_thread(_load_upcoming_exams, db, school_id),
+            "performance": lambda: asyncio.to_thread(_load_performance, db, school_id),
+            "recent_activity": lambda: recent_activity.fetch(db, school_id, RECENT_ACTIVITY_LIMIT),
+            "config": lambda: asyncio.to_thread(load_school_config, db, school_id),
+        }
+        if user_id:
+            loaders["permissions"] = lambda: asyncio.to_thread(load_user_permissions, db, user_id)
+
+        results = await asyncio.gather(*[
+            _load_section(name, (name, school_id, user_id if name == "permissions" else None), loader)
+            for name, loader in loaders.items()
+        ])
+
+        data: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        for name, (section, error) in zip(loaders, results):
+            data[name] = section
+            if error:
+                errors[name] = error
+
+        return APIResponse(
+            success=True,
+            data=data,
+            message="Dashboard loaded" if not errors else f"Dashboard loaded without {', '.join(errors)}",
+            error="; ".join(f"{name}: {error}" for name, error in errors.items()) or None
+        )
+
+    except Exception as e:
+        logger.error(f"Error in get_dashboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
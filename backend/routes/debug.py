@@ -0,0 +1,60 @@
+from fastapi import APIRouter, HTTPException, Depends, Header
+from typing import Optional
+from models import ProfilingConfigUpdate, APIResponse
+from utils.profiling import request_profiler, debug_token_valid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None)):
+    """Debug endpoints need the configured X-Debug-Token"""
+    if not debug_token_valid(x_debug_token):
+        raise HTTPException(status_code=403, detail="Debug access denied")
+
+
+router = APIRouter(prefix="/debug", tags=["Debug"], dependencies=[Depends(require_debug_token)])
+
+@router.get("/profiling", response_model=APIResponse)
+async def get_profiling_config():
+    """Get the current profiling settings"""
+    return APIResponse(
+        success=True,
+        data=request_profiler.status()
+    )
+
+@router.post("/profiling", response_model=APIResponse)
+async def update_profiling_config(config: ProfilingConfigUpdate):
+    """Change the sample rate or slow-request threshold for this worker"""
+    request_profiler.configure(
+        sample_rate=config.sample_rate,
+        slow_threshold_ms=config.slow_threshold_ms
+    )
+    logger.info(f"Profiling updated: {request_profiler.status()}")
+
+    return APIResponse(
+        success=True,
+        data=request_profiler.status(),
+        message="Profiling settings updated"
+    )
+
+@router.get("/slow-requests", response_model=APIResponse)
+async def get_slow_requests(limit: int = 20):
+    """Get the most recent slow or sampled requests, newest first"""
+    records = list(request_profiler.records)[::-1][:limit]
+
+    return APIResponse(
+        success=True,
+        data=records,
+        message=f"Retrieved {len(records)} profiled requests"
+    )
+
+@router.delete("/slow-requests", response_model=APIResponse)
+async def clear_slow_requests():
+    """Clear stored profiling records"""
+    request_profiler.records.clear()
+
+    return APIResponse(
+        success=True,
+        message="Profiling records cleared"
+    )
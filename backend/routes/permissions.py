@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from typing import List
+from typing import List, Optional, Dict, Any
 from models import PermissionCheck, PermissionCheckResponse, APIResponse, UserRole
 from database import get_db
 import logging
@@ -67,39 +67,44 @@ async def check_permission(request: PermissionCheck):
         logger.error(f"Error checking permission: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def load_user_permissions(db, user_id: str) -> Optional[Dict[str, Any]]:
+    """Role and permissions for a user, or None if the user does not exist"""
+    # Get user's role
+    user_result = db.table('teacher_profiles')\
+        .select('role')\
+        .eq('id', user_id)\
+        .single()\
+        .execute()
+    
+    if not user_result.data:
+        return None
+    
+    user_role = user_result.data.get('role')
+    
+    # Get all permissions for this role
+    result = db.table('role_permissions')\
+        .select('permission_id, permissions(name, description, resource_type, action)')\
+        .eq('role', user_role)\
+        .execute()
+    
+    return {
+        "role": user_role,
+        "permissions": [item['permissions'] for item in result.data if item.get('permissions')]
+    }
+
 @router.get("/user/{user_id}", response_model=APIResponse)
 async def get_user_permissions(user_id: str):
     """Get all permissions for a user based on their role"""
     try:
-        db = get_db()
-        
-        # Get user's role
-        user_result = db.table('teacher_profiles')\
-            .select('role')\
-            .eq('id', user_id)\
-            .single()\
-            .execute()
+        data = load_user_permissions(get_db(), user_id)
         
-        if not user_result.data:
+        if data is None:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_role = user_result.data.get('role')
-        
-        # Get all permissions for this role
-        result = db.table('role_permissions')\
-            .select('permission_id, permissions(name, description, resource_type, action)')\
-            .eq('role', user_role)\
-            .execute()
-        
-        permissions = [item['permissions'] for item in result.data if item.get('permissions')]
-        
         return APIResponse(
             success=True,
-            data={
-                "role": user_role,
-                "permissions": permissions
-            },
-            message=f"Retrieved {len(permissions)} permissions"
+            data=data,
+            message=f"Retrieved {len(data['permissions'])} permissions"
         )
         
     except HTTPException:
@@ -11,7 +11,15 @@ import uuid
 from datetime import datetime
 
 # Import new routes
-from routes import audit, storage, permissions, config as config_routes
+from routes import audit, storage, permissions, dashboard, debug, config as config_routes
+from database import get_db
+from utils.recent_activity import recent_activity
+from utils.event_hub import audit_event_hub, create_broadcast_backend
+from utils.audit_archive import audit_archive, run_archive_loop
+from utils.audit_coalescer import audit_coalescer, run_coalesce_flush_loop
+from utils.admission import admission_controller, AdmissionMiddleware
+from utils.profiling import ProfilingMiddleware, instrument_routes
+import asyncio
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -75,14 +83,28 @@ async def get_status_checks():
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+@api_router.get("/admission/metrics")
+async def admission_metrics():
+    """Rate limiter and concurrency counters for this worker"""
+    return admission_controller.metrics()
+
 # Include all routers
 api_router.include_router(audit.router)
 api_router.include_router(storage.router)
 api_router.include_router(permissions.router)
 api_router.include_router(config_routes.router)
+api_router.include_router(dashboard.router)
+api_router.include_router(debug.router)
 
 # Include the main API router in the app
 app.include_router(api_router)
+instrument_routes(app.routes)
+
+# Admission control: reject over-limit requests fast instead of queueing them
+app.add_middleware(AdmissionMiddleware)
+
+# Profiling: sampled and slow requests only, a pass-through otherwise
+app.add_middleware(ProfilingMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -104,8 +126,27 @@ logger = logging.getLogger(__name__)
 async def startup_event():
     logger.info("SEAMS API starting up...")
     logger.info("API documentation available at /docs")
+    try:
+        backend = create_broadcast_backend()
+        await backend.start()
+        audit_event_hub.set_backend(backend)
+    except Exception as e:
+        logger.error(f"Failed to start audit event backend, using in-process delivery: {str(e)}")
+    try:
+        recent_activity.warm(get_db())
+    except Exception as e:
+        logger.error(f"Failed to warm recent activity buffer: {str(e)}")
+    if audit_archive.enabled:
+        asyncio.create_task(run_archive_loop(get_db))
+    if audit_coalescer.window_seconds:
+        asyncio.create_task(run_coalesce_flush_loop(get_db))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     logger.info("Shutting down SEAMS API...")
+    await audit_event_hub.backend.close()
+    try:
+        await audit_coalescer.flush(get_db(), force=True)
+    except Exception as e:
+        logger.error(f"Failed to flush coalesced audit logs: {str(e)}")
     client.close()
@@ -0,0 +1,209 @@
+from config import settings
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+import jwt
+import logging
+import math
+import re
+import time
+from typing import Optional, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEAVY = "heavy"
+DEFAULT = "default"
+
+# Endpoints that scan many rows, including archived months. Their handlers are
+# sync so they run on the threadpool and the concurrency cap applies. The
+# dashboard fans out too, but its sections are cached per school, so it stays
+# in the default class where a whole school loading it at once does not
+# exhaust a small shared bucket.
+HEAVY_ROUTES = (
+    re.compile(r"^/api/audit/(logs|stats|search)$"),
+)
+
+# Never limited: liveness checks, docs and the monitoring endpoint itself
+EXEMPT_ROUTES = (
+    re.compile(r"^/api/?$"),
+    re.compile(r"^/api/(health|admission/metrics)$"),
+    re.compile(r"^/api/debug/"),
+    re.compile(r"^/(docs|redoc|openapi\.json)"),
+)
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+
+class AdmissionController:
+    """Per-school token buckets plus a concurrency cap for heavy routes.
+
+    Requests over either limit are rejected immediately with a Retry-After
+    hint rather than queued, so one busy school cannot hold workers hostage.
+    The school comes from the caller's verified access token, never from
+    request parameters, so it cannot be used to dodge or exhaust a limit.
+    All state is in memory and therefore per worker.
+    """
+
+    def __init__(
+        self,
+        limits_per_minute: Optional[Dict[str, int]] = None,
+        heavy_max_concurrency: int = settings.heavy_max_concurrency,
+        jwt_secret: str = settings.supabase_jwt_secret,
+        proxy_hops: int = settings.forwarded_proxy_hops
+    ):
+        self.limits = limits_per_minute or {
+            DEFAULT: settings.rate_limit_default_per_minute,
+            HEAVY: settings.rate_limit_heavy_per_minute,
+        }
+        self.heavy_max_concurrency = heavy_max_concurrency
+        self.jwt_secret = jwt_secret
+        self.proxy_hops = proxy_hops
+        self.in_flight = {DEFAULT: 0, HEAVY: 0}
+        self.counters = {
+            route_class: {"admitted": 0, "rate_limited": 0, "overloaded": 0}
+            for route_class in self.limits
+        }
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._last_prune = time.monotonic()
+
+    @staticmethod
+    def classify(path: str) -> Optional[str]:
+        """Route class for a path, or None if it is not limited"""
+        if any(pattern.match(path) for pattern in EXEMPT_ROUTES):
+            return None
+        if any(pattern.match(path) for pattern in HEAVY_ROUTES):
+            return HEAVY
+        return DEFAULT
+
+    def _claims(self, authorization: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Claims of a Supabase access token signed with the project secret"""
+        if not self.jwt_secret or not authorization or not authorization.lower().startswith('bearer '):
+            return None
+        try:
+            return jwt.decode(
+                authorization[len('bearer '):],
+                self.jwt_secret,
+                algorithms=['HS256'],
+                options={"verify_aud": False}
+            )
+        except jwt.PyJWTError:
+            return None
+
+    def client_address(self, scope, headers: Headers) -> str:
+        """Caller address, skipping the X-Forwarded-For entries our own proxies added"""
+        if self.proxy_hops:
+            forwarded = [a.strip() for a in headers.get('x-forwarded-for', '').split(',') if a.strip()]
+            if len(forwarded) >= self.proxy_hops:
+                return forwarded[-self.proxy_hops]
+        client = scope.get('client')
+        return client[0] if client else 'unknown'
+
+    def client_key(self, scope) -> str:
+        """Bucket key: the caller's school, else the caller's user, else their address"""
+        headers = Headers(scope=scope)
+        claims = self._claims(headers.get('authorization'))
+        if claims:
+            school_id = (claims.get('user_metadata') or {}).get('school_id')
+            if school_id:
+                return f"school:{school_id}"
+            if claims.get('sub'):
+                return f"user:{claims['sub']}"
+        return f"ip:{self.client_address(scope, headers)}"
+
+    def _take_token(self, key: str, route_class: str, now: float) -> float:
+        """Consume a token; returns 0 if admitted, else seconds until one is available"""
+        capacity = self.limits[route_class]
+        rate = capacity / 60.0
+        bucket = self._buckets.get((key, route_class))
+        if bucket is None:
+            bucket = self._buckets[(key, route_class)] = TokenBucket(capacity, now)
+
+        bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated) * rate)
+        bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / rate
+
+    def _prune(self, now: float) -> None:
+        """Drop buckets idle long enough to have refilled completely"""
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        for bucket_key in [k for k, b in self._buckets.items() if now - b.updated >= 60]:
+            del self._buckets[bucket_key]
+
+    def admit(self, key: str, route_class: str) -> Tuple[Optional[int], Optional[int]]:
+        """Return (status, retry_after) for a rejected request, or (None, None)"""
+        now = time.monotonic()
+        self._prune(now)
+
+        wait = self._take_token(key, route_class, now)
+        if wait:
+            self.counters[route_class]["rate_limited"] += 1
+            return 429, max(1, math.ceil(wait))
+
+        if route_class == HEAVY and self.in_flight[HEAVY] >= self.heavy_max_concurrency:
+            self.counters[route_class]["overloaded"] += 1
+            return 503, 1
+
+        self.counters[route_class]["admitted"] += 1
+        self.in_flight[route_class] += 1
+        return None, None
+
+    def release(self, route_class: str) -> None:
+        self.in_flight[route_class] -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "limits_per_minute": self.limits,
+            "heavy_max_concurrency": self.heavy_max_concurrency,
+            "in_flight": dict(self.in_flight),
+            "counters": self.counters,
+            "tracked_buckets": len(self._buckets),
+        }
+
+
+# Shared controller for this worker
+admission_controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """Reject over-limit requests fast instead of queueing them.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so admitted requests (and SSE
+    streams in particular) reach the app without an extra task per request.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'OPTIONS':
+            return await self.app(scope, receive, send)
+        route_class = self.controller.classify(scope['path'])
+        if route_class is None:
+            return await self.app(scope, receive, send)
+
+        status, retry_after = self.controller.admit(self.controller.client_key(scope), route_class)
+        if status:
+            response = JSONResponse(
+                status_code=status,
+                content={
+                    "success": False,
+                    "error": "Rate limit exceeded" if status == 429 else "Server busy, try again shortly"
+                },
+                headers={"Retry-After": str(retry_after)}
+            )
+            return await response(scope, receive, send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
@@ -0,0 +1,447 @@
+from config import settings
+from database import iter_pages, newest_first_after
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager, asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+AUDIT_LOG_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('user_id', pa.string()),
+    ('user_email', pa.string()),
+    ('action_type', pa.string()),
+    ('resource_type', pa.string()),
+    ('resource_id', pa.string()),
+    ('resource_name', pa.string()),
+    ('details', pa.string()),  # JSON encoded
+    ('ip_address', pa.string()),
+    ('user_agent', pa.string()),
+    ('school_id', pa.string()),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+])
+
+ROW_GROUP_SIZE = 50000
+SYNC_RETRY_SECONDS = 300
+# Arbitrary application-wide key for pg_try_advisory_lock
+ARCHIVE_LOCK_ID = 73210901
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO date or timestamp, treating naive values as UTC"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+class AuditArchive:
+    """Cold tier of audit_logs: one compressed Parquet file per calendar month.
+
+    Months older than the hot window are moved out of the audit_logs table,
+    so every archived row is older than every hot row. Files are uploaded to
+    a Supabase Storage bucket, which is the copy of record, and cached in a
+    local directory that other hosts fill from the bucket on demand.
+    """
+
+    def __init__(
+        self,
+        directory: str = settings.audit_archive_dir,
+        bucket: str = settings.audit_archive_bucket,
+        hot_months: int = settings.audit_hot_months,
+        enabled: bool = settings.audit_archive_enabled
+    ):
+        self.enabled = enabled
+        self.directory = Path(directory)
+        self.bucket = bucket
+        self.hot_months = hot_months
+        self._synced_at: Optional[float] = None
+
+    def _path(self, month: datetime) -> Path:
+        return self.directory / f"audit_logs_{month:%Y-%m}.parquet"
+
+    def _tmp_path(self, path: Path) -> Path:
+        # Unique per writer so concurrent processes never share a temp file
+        return path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+
+    def sync_from_bucket(self, db, force: bool = False) -> None:
+        """Download archived months that are missing locally.
+
+        Other hosts archive months over time, so the bucket is listed again
+        whenever the newest month that should be archived is missing here
+        (at most every SYNC_RETRY_SECONDS), and on every archive run.
+        """
+        if not self.bucket:
+            return
+        now = time.monotonic()
+        if not force and self._synced_at is not None:
+            newest_expected = self._path(add_months(self.hot_cutoff(), -1))
+            if newest_expected.exists() or now - self._synced_at < SYNC_RETRY_SECONDS:
+                return
+        self._synced_at = now
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for item in db.storage.from_(self.bucket).list('audit_logs'):
+            path = self.directory / item['name']
+            if not path.exists():
+                tmp_path = self._tmp_path(path)
+                tmp_path.write_bytes(db.storage.from_(self.bucket).download(f"audit_logs/{item['name']}"))
+                os.replace(tmp_path, path)
+
+    def months(self, db=None) -> List[datetime]:
+        """Archived months, newest first"""
+        if db is not None:
+            self.sync_from_bucket(db)
+        if not self.directory.exists():
+            return []
+        months = [
+            datetime.strptime(path.stem[len('audit_logs_'):], '%Y-%m').replace(tzinfo=timezone.utc)
+            for path in self.directory.glob('audit_logs_*.parquet')
+        ]
+        return sorted(months, reverse=True)
+
+    def hot_cutoff(self) -> datetime:
+        """Start of the oldest month kept in the hot table"""
+        return add_months(month_start(datetime.now(timezone.utc)), 1 - self.hot_months)
+
+    # ------------------------------------------------------------------
+    # Archiving
+    # ------------------------------------------------------------------
+    def _month_pages(self, db, start: datetime, end: datetime) -> Iterator[List[Dict[str, Any]]]:
+        def page_after(last_row):
+            query = db.table('audit_logs')\
+                .select('*')\
+                .gte('created_at', start.isoformat())\
+                .lt('created_at', end.isoformat())\
+                .order('created_at', desc=True)\
+                .order('id', desc=True)
+            if last_row:
+                query = newest_first_after(query, last_row['created_at'], last_row['id'])
+            return query
+
+        return iter_pages(page_after)
+
+    def _write_month(self, db, month: datetime, pages: Iterable[List[Dict[str, Any]]]) -> int:
+        """Stream pages of rows into the month's file and upload it; returns rows written.
+
+        Rows are buffered one row group at a time, so memory stays flat
+        however busy the month was.
+        """
+        path = self._path(month)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._tmp_path(path)
+        # Rerun after an interrupted archive: keep rows only the old file has
+        merge = path.exists()
+        written_ids: List[pa.Array] = []
+        written = 0
+
+        try:
+            with pq.ParquetWriter(tmp_path, AUDIT_LOG_SCHEMA, compression='zstd') as writer:
+                def write_rows(rows: List[Dict[str, Any]]) -> None:
+                    nonlocal written
+                    table = _to_table(rows)
+                    writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+                    written += table.num_rows
+                    if merge:
+                        written_ids.extend(table['id'].chunks)
+
+                buffered: List[Dict[str, Any]] = []
+                for page in pages:
+                    buffered.extend(page)
+                    if len(buffered) >= ROW_GROUP_SIZE:
+                        write_rows(buffered)
+                        buffered = []
+                if buffered:
+                    write_rows(buffered)
+
+                if merge:
+                    ids = pa.chunked_array(written_ids, pa.string()).combine_chunks()
+                    with pq.ParquetFile(path) as existing:
+                        for batch in existing.iter_batches(batch_size=ROW_GROUP_SIZE):
+                            batch = batch.filter(pc.invert(pc.is_in(batch['id'], value_set=ids)))
+                            if batch.num_rows:
+                                writer.write_batch(batch)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        db.storage.from_(self.bucket).upload(
+            f"audit_logs/{path.name}",
+            path,
+            {"content-type": "application/octet-stream", "upsert": "true"}
+        )
+        return written
+
+    def _uploaded(self, db, path: Path) -> bool:
+        """Whether the bucket holds this file at its full size"""
+        for item in db.storage.from_(self.bucket).list('audit_logs', {"search": path.name}):
+            if item['name'] == path.name:
+                return (item.get('metadata') or {}).get('size') == path.stat().st_size
+        return False
+
+    @contextmanager
+    def _archive_lock(self):
+        """Exclusive lock for workers sharing this archive directory; yields False if held"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / '.archive.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _count_month(self, db, start: datetime, end: datetime) -> int:
+        result = db.table('audit_logs')\
+            .select('id', count='exact', head=True)\
+            .gte('created_at', start.isoformat())\
+            .lt('created_at', end.isoformat())\
+            .execute()
+        return result.count or 0
+
+    def archive(self, db) -> int:
+        """Move every month older than the hot window to the cold tier.
+
+        Only one process may archive at a time: run_archive_loop takes a
+        Postgres advisory lock across hosts, and this takes a file lock
+        across workers sharing the directory. Hot rows are only deleted once
+        their month is in the bucket, so archiving refuses to run without one.
+        """
+        if not self.bucket:
+            logger.error("Audit archive needs AUDIT_ARCHIVE_BUCKET; keeping all rows in audit_logs")
+            return 0
+        with self._archive_lock() as acquired:
+            if not acquired:
+                logger.info("Audit archive already running in another worker, skipping")
+                return 0
+            self.sync_from_bucket(db, force=True)
+            return self._archive_months(db)
+
+    def _archive_months(self, db) -> int:
+        cutoff = self.hot_cutoff()
+        oldest = db.table('audit_logs')\
+            .select('created_at')\
+            .lt('created_at', cutoff.isoformat())\
+            .order('created_at')\
+            .limit(1)\
+            .execute()
+        if not oldest.data:
+            return 0
+
+        archived = 0
+        month = month_start(parse_timestamp(oldest.data[0]['created_at']))
+        while month < cutoff:
+            end = add_months(month, 1)
+            if self._count_month(db, month, end):
+                archived += self._archive_month(db, month, end)
+            month = end
+        return archived
+
+    def _archive_month(self, db, month: datetime, end: datetime) -> int:
+        written = self._write_month(db, month, self._month_pages(db, month, end))
+        if not self._uploaded(db, self._path(month)):
+            logger.error(f"Audit archive for {month:%Y-%m} missing from bucket; keeping hot rows")
+            return 0
+        # Never delete rows the file may not contain
+        remaining = self._count_month(db, month, end)
+        if remaining != written:
+            logger.error(
+                f"Audit logs for {month:%Y-%m} changed while archiving "
+                f"({written} written, {remaining} in table); keeping hot rows"
+            )
+            return 0
+        db.table('audit_logs')\
+            .delete()\
+            .gte('created_at', month.isoformat())\
+            .lt('created_at', end.isoformat())\
+            .execute()
+        logger.info(f"Archived {written} audit logs for {month:%Y-%m}")
+        return written
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+    def _scan(
+        self,
+        db,
+        columns: Optional[List[str]],
+        filters: Dict[str, Optional[str]],
+        start_date: Optional[str],
+        end_date: Optional[str]
+    ):
+        """Yield filtered tables month by month, newest first"""
+        start = parse_timestamp(start_date) if start_date else None
+        end = parse_timestamp(end_date) if end_date else None
+
+        predicates: List[Tuple[str, str, Any]] = [
+            (field, '=', value) for field, value in filters.items() if value
+        ]
+        if start:
+            predicates.append(('created_at', '>=', start))
+        if end:
+            predicates.append(('created_at', '<=', end))
+
+        for month in self.months(db):
+            # Skip whole files outside the requested date range
+            if (end and end < month) or (start and start >= add_months(month, 1)):
+                continue
+            yield pq.read_table(
+                self._path(month),
+                columns=columns,
+                filters=predicates or None,
+                memory_map=True
+            )
+
+    def get_logs(
+        self,
+        db,
+        filters: Dict[str, Optional[str]],
+        start_date: Optional[str],
+        end_date: Optional[str],
+        limit: int,
+        offset: int
+    ) -> List[Dict[str, Any]]:
+        """Archived rows ordered newest first, paginated like the hot query"""
+        rows: List[Dict[str, Any]] = []
+        for table in self._scan(db, None, filters, start_date, end_date):
+            if offset >= table.num_rows:
+                offset -= table.num_rows
+                continue
+            # Files are written newest first, except rows merged in on a rerun
+            table = table.sort_by([('created_at', 'descending'), ('id', 'descending')])
+            rows.extend(table.slice(offset, limit - len(rows)).to_pylist())
+            offset = 0
+            if len(rows) >= limit:
+                break
+
+        return _to_rows(rows)
+
+    def search(
+        self,
+        db,
+        q: str,
+        filters: Dict[str, Optional[str]],
+        before: Optional[Tuple[str, str]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Archived rows containing q, newest first, strictly after the (created_at, id) keyset"""
+        before_at = parse_timestamp(before[0]) if before else None
+        rows: List[Dict[str, Any]] = []
+        for table in self._scan(db, None, filters, None, before[0] if before else None):
+            mask = pc.or_kleene(
+                pc.or_kleene(
+                    pc.match_substring(table['user_email'], q, ignore_case=True),
+                    pc.match_substring(table['resource_name'], q, ignore_case=True)
+                ),
+                pc.match_substring(table['details'], q, ignore_case=True)
+            )
+            table = table.filter(pc.fill_null(mask, False))
+            if before_at:
+                table = table.filter(pc.or_(
+                    pc.less(table['created_at'], before_at),
+                    pc.and_(pc.equal(table['created_at'], before_at), pc.less(table['id'], before[1]))
+                ))
+            table = table.sort_by([('created_at', 'descending'), ('id', 'descending')])
+            rows.extend(table.slice(0, limit - len(rows)).to_pylist())
+            if len(rows) >= limit:
+                break
+        return _to_rows(rows)
+
+    def count_by(
+        self,
+        db,
+        fields: List[str],
+        filters: Dict[str, Optional[str]]
+    ) -> Dict[str, Dict[str, int]]:
+        """Row counts per value of each field across the cold tier"""
+        counts: Dict[str, Dict[str, int]] = {field: {} for field in fields}
+        for table in self._scan(db, fields, filters, None, None):
+            for field in fields:
+                for item in table.group_by(field).aggregate([(field, 'count')]).to_pylist():
+                    key = item[field] or 'unknown'
+                    counts[field][key] = counts[field].get(key, 0) + item[f"{field}_count"]
+        return counts
+
+
+def _to_table(rows: List[Dict[str, Any]]) -> pa.Table:
+    """Convert audit_logs rows to the archive schema"""
+    records = [
+        {
+            **{field: row.get(field) for field in AUDIT_LOG_SCHEMA.names},
+            # Unescaped, like the details::text that hot search matches against
+            'details': json.dumps(row['details'], ensure_ascii=False) if row.get('details') is not None else None,
+            'created_at': parse_timestamp(row['created_at'])
+        }
+        for row in rows
+    ]
+    return pa.Table.from_pylist(records, schema=AUDIT_LOG_SCHEMA)
+
+
+def _to_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Restore archived records to the shape returned by the audit_logs table"""
+    for row in rows:
+        row['details'] = json.loads(row['details']) if row['details'] else None
+        row['created_at'] = row['created_at'].isoformat()
+    return rows
+
+
+@asynccontextmanager
+async def _archive_leadership():
+    """Postgres advisory lock so only one host archives; yields False if another holds it"""
+    if not settings.database_url:
+        yield True
+        return
+
+    import asyncpg
+
+    connection = await asyncpg.connect(settings.database_url)
+    try:
+        # Session lock, released when the connection closes
+        yield await connection.fetchval("SELECT pg_try_advisory_lock($1)", ARCHIVE_LOCK_ID)
+    finally:
+        await connection.close()
+
+
+async def run_archive_loop(db_factory, interval_hours: int = settings.audit_archive_interval_hours) -> None:
+    """Periodically move old months out of the hot table"""
+    while True:
+        try:
+            async with _archive_leadership() as leader:
+                if leader:
+                    archived = await asyncio.to_thread(audit_archive.archive, db_factory())
+                    if archived:
+                        logger.info(f"Audit archive moved {archived} rows to cold storage")
+                else:
+                    # Still pick up months other hosts have archived
+                    await asyncio.to_thread(audit_archive.sync_from_bucket, db_factory(), True)
+        except Exception as e:
+            logger.error(f"Error archiving audit logs: {str(e)}")
+        await asyncio.sleep(interval_hours * 3600)
+
+
+# Shared archive for this worker
+audit_archive = AuditArchive()
@@ -0,0 +1,141 @@
+from config import settings
+from models import ActionType
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Security-critical actions are always written as individual rows
+NEVER_COALESCE = {ActionType.LOGIN.value, ActionType.LOGOUT.value, ActionType.DELETE.value}
+
+
+class _Window:
+    """Duplicates folded into one audit row"""
+
+    __slots__ = ('row_id', 'details', 'first_seen', 'last_seen', 'count', 'expires_at')
+
+    def __init__(self, row: Dict[str, Any], expires_at: float):
+        self.row_id = row.get('id')
+        self.details = row.get('details') or {}
+        self.first_seen = row.get('created_at')
+        self.last_seen = self.first_seen
+        self.count = 1
+        self.expires_at = expires_at
+
+
+class AuditCoalescer:
+    """Folds repeated (user, action, resource) events inside a time window.
+
+    The first event is written as usual; repeats within the window only bump
+    an in-memory counter. When the window closes the original row's details
+    are updated once with the occurrence count and first/last timestamps.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int = settings.audit_coalesce_window_seconds,
+        actions: str = settings.audit_coalesce_actions,
+        max_keys: int = settings.audit_coalesce_max_keys
+    ):
+        self.window_seconds = window_seconds
+        self.actions = {a.strip() for a in actions.split(',') if a.strip()} - NEVER_COALESCE
+        self.max_keys = max_keys
+        self._windows: "OrderedDict[Tuple, _Window]" = OrderedDict()
+        self._closed: List[_Window] = []
+
+    def key_for(self, audit_data: Dict[str, Any]) -> Optional[Tuple]:
+        """Coalescing key for an event, or None if it must be written as is"""
+        if not self.window_seconds or audit_data.get('action_type') not in self.actions:
+            return None
+        if not audit_data.get('user_id'):
+            return None
+        return (
+            audit_data['user_id'],
+            audit_data['action_type'],
+            audit_data.get('resource_type'),
+            audit_data.get('resource_name') or audit_data.get('resource_id'),
+            audit_data.get('school_id')
+        )
+
+    def absorb(self, key: Tuple) -> bool:
+        """Count a repeat of an open window; False if the event should be written"""
+        window = self._windows.get(key)
+        if window is None:
+            return False
+        if window.expires_at <= time.monotonic():
+            self._close(key)
+            return False
+        window.count += 1
+        window.last_seen = datetime.now(timezone.utc).isoformat()
+        return True
+
+    def track(self, key: Tuple, row: Dict[str, Any]) -> None:
+        """Open a window for a freshly written row"""
+        if key in self._windows:
+            self._close(key)
+        self._windows[key] = _Window(row, time.monotonic() + self.window_seconds)
+        while len(self._windows) > self.max_keys:
+            self._close(next(iter(self._windows)))
+
+    def _close(self, key: Tuple) -> None:
+        window = self._windows.pop(key)
+        if window.count > 1:
+            self._closed.append(window)
+
+    def collect(self, force: bool = False) -> List[_Window]:
+        """Close expired windows (all windows when force is set) and take those with repeats"""
+        now = time.monotonic()
+        # Windows are opened in order, so expired ones are at the front
+        for key in list(self._windows):
+            if not force and self._windows[key].expires_at > now:
+                break
+            self._close(key)
+
+        closed, self._closed = self._closed, []
+        return closed
+
+    @staticmethod
+    def write(db, windows: List[_Window]) -> int:
+        """Update each window's row with its counts; blocking, so run it off the event loop"""
+        for window in windows:
+            try:
+                db.table('audit_logs')\
+                    .update({
+                        "details": {
+                            **window.details,
+                            "occurrences": window.count,
+                            "first_seen": window.first_seen,
+                            "last_seen": window.last_seen
+                        }
+                    })\
+                    .eq('id', window.row_id)\
+                    .execute()
+            except Exception as e:
+                logger.error(f"Error flushing coalesced audit log {window.row_id}: {str(e)}")
+        return len(windows)
+
+    async def flush(self, db, force: bool = False) -> int:
+        """Write counts for closed windows without blocking the event loop"""
+        closed = self.collect(force)
+        if not closed:
+            return 0
+        return await asyncio.to_thread(self.write, db, closed)
+
+
+async def run_coalesce_flush_loop(db_factory) -> None:
+    """Periodically write counts for windows that have closed"""
+    interval = max(audit_coalescer.window_seconds, 1)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await audit_coalescer.flush(db_factory())
+        except Exception as e:
+            logger.error(f"Error flushing coalesced audit logs: {str(e)}")
+
+
+# Shared coalescer for this worker
+audit_coalescer = AuditCoalescer()
@@ -1,4 +1,6 @@
 from database import get_db
+from utils.event_hub import audit_event_hub
+from utils.audit_coalescer import audit_coalescer
 from models import AuditLogCreate, ActionType, ResourceType
 import logging
 from datetime import datetime
@@ -40,9 +42,17 @@ class AuditLogger:
                 "created_at": datetime.utcnow().isoformat()
             }
             
+            # Repeats inside an open coalescing window are only counted
+            coalesce_key = audit_coalescer.key_for(audit_data)
+            if coalesce_key and audit_coalescer.absorb(coalesce_key):
+                return True
+            
             result = db.table('audit_logs').insert(audit_data).execute()
             
             if result.data:
+                if coalesce_key:
+                    audit_coalescer.track(coalesce_key, result.data[0])
+                await audit_event_hub.publish(result.data[0])
                 logger.info(f"Audit log created: {action_type.value} on {resource_type.value}")
                 return True
             else:
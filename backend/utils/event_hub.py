@@ -0,0 +1,229 @@
+from config import settings
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Optional, Dict, Any, Callable, List, Set
+
+logger = logging.getLogger(__name__)
+
+# Filters a subscriber may narrow the stream by
+STREAM_FILTER_FIELDS = ('school_id', 'action_type', 'resource_type')
+
+
+class BroadcastBackend(ABC):
+    """Transport that carries audit events to every worker's hub.
+
+    The backend owns event ids so that a client can resume against any
+    worker. Implementations publish to a shared channel and call the
+    attached deliver callback for every event they read back, including
+    their own.
+    """
+
+    _deliver: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    def attach(self, deliver: Callable[[Dict[str, Any]], None]) -> None:
+        self._deliver = deliver
+
+    async def start(self) -> None:
+        """Open connections; called once at startup"""
+
+    async def close(self) -> None:
+        """Release connections; called once at shutdown"""
+
+    @abstractmethod
+    async def publish(self, event: Dict[str, Any]) -> None:
+        """Send an event to every attached hub"""
+
+
+class InMemoryBroadcastBackend(BroadcastBackend):
+    """Single-process backend, used by default and in tests"""
+
+    def __init__(self):
+        self._last_id = 0
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        self._last_id += 1
+        if self._deliver:
+            self._deliver({**event, "event_id": self._last_id})
+
+
+class PostgresBroadcastBackend(BroadcastBackend):
+    """Cross-worker backend using Postgres LISTEN/NOTIFY.
+
+    Event ids come from the audit_event_ids sequence so they are shared by
+    all workers. NOTIFY payloads are limited to 8000 bytes, so oversized
+    events are sent without their details.
+    """
+
+    MAX_PAYLOAD_BYTES = 7900
+    RECONNECT_SECONDS = 5
+
+    def __init__(self, dsn: str, channel: str = settings.audit_stream_channel):
+        self.dsn = dsn
+        self.channel = channel
+        self._listener = None
+        self._pool = None
+        self._closing = False
+
+    async def start(self) -> None:
+        import asyncpg
+
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        await self._listen()
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        self._listener = await asyncpg.connect(self.dsn)
+        await self._listener.add_listener(self.channel, self._on_notify)
+        self._listener.add_termination_listener(self._on_terminated)
+
+    def _on_terminated(self, connection) -> None:
+        if not self._closing:
+            logger.warning("Audit event listener disconnected, reconnecting")
+            asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self._closing:
+            try:
+                await self._listen()
+                return
+            except Exception as e:
+                logger.error(f"Error reconnecting audit event listener: {str(e)}")
+                await asyncio.sleep(self.RECONNECT_SECONDS)
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.error("Ignoring malformed audit event notification")
+            return
+        if self._deliver:
+            self._deliver(event)
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        async with self._pool.acquire() as connection:
+            event_id = await connection.fetchval("SELECT nextval('public.audit_event_ids')")
+            payload = json.dumps({**event, "event_id": event_id}, default=str)
+            if len(payload.encode()) > self.MAX_PAYLOAD_BYTES:
+                payload = json.dumps(
+                    {**event, "details": None, "details_truncated": True, "event_id": event_id},
+                    default=str
+                )
+            await connection.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._listener:
+            await self._listener.close()
+        if self._pool:
+            await self._pool.close()
+
+
+def create_broadcast_backend() -> BroadcastBackend:
+    """Postgres LISTEN/NOTIFY when a database URL is configured, in-memory otherwise"""
+    if settings.audit_stream_database_url:
+        return PostgresBroadcastBackend(settings.audit_stream_database_url)
+    return InMemoryBroadcastBackend()
+
+
+class Subscription:
+    """A single stream client with a bounded, drop-oldest buffer"""
+
+    def __init__(self, filters: Dict[str, str], buffer_size: int):
+        self.filters = filters
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return all(event.get(field) == value for field, value in self.filters.items())
+
+    def push(self, event: Dict[str, Any]) -> None:
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(event)
+        self._ready.set()
+
+    async def next_event(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Return the next buffered event, or None if nothing arrives within timeout"""
+        if not self.buffer:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.buffer.popleft()
+
+
+class AuditEventHub:
+    """In-process fan-out of audit events to stream subscribers"""
+
+    def __init__(
+        self,
+        backend: Optional[BroadcastBackend] = None,
+        buffer_size: int = settings.audit_stream_buffer_size,
+        replay_size: int = settings.audit_stream_replay_size,
+        publish_timeout: float = settings.audit_stream_publish_timeout_seconds
+    ):
+        self.buffer_size = buffer_size
+        self.publish_timeout = publish_timeout
+        self._subscribers: Set[Subscription] = set()
+        self._replay = deque(maxlen=replay_size)
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.set_backend(backend or InMemoryBroadcastBackend())
+
+    def set_backend(self, backend: BroadcastBackend) -> None:
+        """Swap the transport, e.g. for a cross-worker backend at startup"""
+        self.backend = backend
+        backend.attach(self._dispatch)
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        """Best effort: the audit row is already written, so a slow backend only costs the live event"""
+        try:
+            await asyncio.wait_for(self.backend.publish(event), self.publish_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Audit event publish timed out after {self.publish_timeout}s, event not streamed")
+        except Exception as e:
+            logger.error(f"Error publishing audit event: {str(e)}")
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """Call listener for every delivered event, whichever worker wrote it"""
+        self._listeners.append(listener)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        self._replay.append(event)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Error in audit event listener: {str(e)}")
+        for subscription in self._subscribers:
+            if subscription.matches(event):
+                subscription.push(event)
+
+    def subscribe(
+        self,
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        last_event_id: Optional[int] = None
+    ) -> Subscription:
+        """Register a subscriber, replaying buffered events after last_event_id"""
+        filters = {k: v for k, v in (filters or {}).items() if k in STREAM_FILTER_FIELDS and v}
+        subscription = Subscription(filters, self.buffer_size)
+
+        if last_event_id is not None:
+            for event in self._replay:
+                if event["event_id"] > last_event_id and subscription.matches(event):
+                    subscription.push(event)
+
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+
+# Shared hub for this worker
+audit_event_hub = AuditEventHub()
@@ -0,0 +1,290 @@
+from config import settings
+from starlette.datastructures import Headers
+import asyncio
+import cProfile
+import functools
+import hmac
+import io
+import logging
+import pstats
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+PROFILE_STATS_LINES = 30
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar('request_profile', default=None)
+
+
+def debug_token_valid(token: Optional[str]) -> bool:
+    """Debug features stay disabled until a token is configured"""
+    if not settings.debug_token or not token:
+        return False
+    # Header values arrive decoded as latin-1; compare_digest only takes ASCII str
+    try:
+        raw = token.encode('latin-1')
+    except UnicodeEncodeError:
+        return False
+    return hmac.compare_digest(raw, settings.debug_token.encode())
+
+
+class RequestProfile:
+    """Timing breakdown collected while a request is in flight"""
+
+    __slots__ = (
+        'method', 'path', 'started', 'thread_id', 'frame', 'handler_start', 'handler_end',
+        'db_seconds', 'db_calls', 'stack'
+    )
+
+    def __init__(self, method: str, path: str, frame):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        # Event loop thread, and the frame every stack running this request passes through
+        self.thread_id = threading.get_ident()
+        self.frame = frame
+        self.handler_start = None
+        self.handler_end = None
+        self.db_seconds = 0.0
+        self.db_calls = 0
+        self.stack = None
+
+    def breakdown(self, finished: float) -> Dict[str, Any]:
+        def ms(seconds: float) -> float:
+            return round(seconds * 1000, 2)
+
+        timings = {"total_ms": ms(finished - self.started), "db_ms": ms(self.db_seconds), "db_calls": self.db_calls}
+        if self.handler_start is not None and self.handler_end is not None:
+            timings.update({
+                # Routing, dependency resolution and request validation
+                "before_handler_ms": ms(self.handler_start - self.started),
+                # Endpoint body, including database calls
+                "handler_ms": ms(self.handler_end - self.handler_start),
+                # Response model validation and JSON encoding
+                "serialization_ms": ms(finished - self.handler_end),
+            })
+        return timings
+
+
+class RequestProfiler:
+    """Opt-in request profiling and slow-request capture.
+
+    When neither sampling nor slow capture is configured the middleware
+    passes requests straight through, so the cost is a couple of attribute
+    reads per request.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = settings.profiling_sample_rate,
+        slow_threshold_ms: int = settings.slow_request_threshold_ms,
+        store_size: int = settings.slow_request_store_size
+    ):
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.records = deque(maxlen=store_size)
+        self._in_flight = set()
+        self._cprofile_busy = False
+        self._watchdog = None
+        if slow_threshold_ms:
+            self._start_watchdog()
+
+    @property
+    def active(self) -> bool:
+        return self.sample_rate > 0 or self.slow_threshold_ms > 0
+
+    def configure(self, sample_rate: Optional[float] = None, slow_threshold_ms: Optional[int] = None) -> None:
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if slow_threshold_ms is not None:
+            self.slow_threshold_ms = slow_threshold_ms
+            if slow_threshold_ms:
+                self._start_watchdog()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "stored_records": len(self.records),
+        }
+
+    @staticmethod
+    def forced(headers: Headers) -> bool:
+        """A single request can ask to be profiled with X-Profile plus the debug token"""
+        return 'x-profile' in headers and debug_token_valid(headers.get('x-debug-token'))
+
+    async def profile(self, app, scope, receive, send, force: bool = False) -> None:
+        profile = RequestProfile(scope['method'], scope['path'], sys._getframe())
+        token = _current.set(profile)
+        status_code = None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        profiler = None
+        if (force or random.random() < self.sample_rate) and not self._cprofile_busy:
+            # cProfile hooks the whole event loop thread, so only one request at a time
+            self._cprofile_busy = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        self._in_flight.add(profile)
+        try:
+            await app(scope, receive, send_wrapper)
+        finally:
+            finished = time.perf_counter()
+            self._in_flight.discard(profile)
+            profile.frame = None
+            if profiler:
+                profiler.disable()
+                self._cprofile_busy = False
+            _current.reset(token)
+
+        elapsed_ms = (finished - profile.started) * 1000
+        slow = bool(self.slow_threshold_ms) and elapsed_ms >= self.slow_threshold_ms
+        if slow or profiler:
+            record = {
+                "method": profile.method,
+                "path": profile.path,
+                "query": scope.get('query_string', b'').decode('latin-1'),
+                "status_code": status_code,
+                "recorded_at": datetime.utcnow().isoformat(),
+                "slow": slow,
+                "timings": profile.breakdown(finished),
+                "stack": profile.stack,
+            }
+            if profiler:
+                record["profile"] = _format_stats(profiler)
+            self.records.append(record)
+            if slow:
+                logger.warning(f"Slow request {profile.method} {profile.path}: {elapsed_ms:.0f}ms")
+
+    def _start_watchdog(self) -> None:
+        if self._watchdog is None:
+            self._watchdog = threading.Thread(target=self._watch, name='slow-request-watchdog', daemon=True)
+            self._watchdog.start()
+
+    def _watch(self) -> None:
+        """Snapshot the event loop's stack while a slow request is blocking it.
+
+        A stack is only kept when the loop thread is executing inside the
+        request's own frames. A request that is merely waiting (on I/O, a
+        worker thread or another request hogging the loop) is checked again
+        on the next tick, and ends up with no stack if it never blocks.
+        Sync endpoints and streamed bodies run outside the request's task,
+        so they are never captured.
+        """
+        while True:
+            threshold = self.slow_threshold_ms / 1000
+            time.sleep(max(threshold / 2, 0.05) if threshold else 1)
+            if not threshold:
+                continue
+            now = time.perf_counter()
+            frames = None
+            for profile in list(self._in_flight):
+                if profile.stack is None and now - profile.started >= threshold:
+                    frames = frames or sys._current_frames()
+                    frame = frames.get(profile.thread_id)
+                    if _runs_inside(frame, profile.frame):
+                        profile.stack = traceback.format_stack(frame)
+
+
+def _runs_inside(frame, request_frame) -> bool:
+    while frame is not None and request_frame is not None:
+        if frame is request_frame:
+            return True
+        frame = frame.f_back
+    return False
+
+
+def _format_stats(profiler: cProfile.Profile) -> str:
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_STATS_LINES)
+    return output.getvalue()
+
+
+def _timed_endpoint(call):
+    """Record when the endpoint body starts and ends for the current request"""
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await call(*args, **kwargs)
+            profile.handler_start = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                profile.handler_end = time.perf_counter()
+    else:
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return call(*args, **kwargs)
+            profile.handler_start = time.perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                profile.handler_end = time.perf_counter()
+    return wrapper
+
+
+def instrument_routes(routes: List[Any]) -> None:
+    """Wrap every API endpoint so handler time can be told apart from serialization"""
+    for route in routes:
+        dependant = getattr(route, 'dependant', None)
+        if dependant is not None and dependant.call is not None:
+            dependant.call = _timed_endpoint(dependant.call)
+
+
+def _db_request_started(request) -> None:
+    if _current.get() is not None:
+        request.extensions['profile_started'] = time.perf_counter()
+
+
+def _db_response_received(response) -> None:
+    profile = _current.get()
+    started = response.request.extensions.get('profile_started')
+    if profile is not None and started is not None:
+        profile.db_seconds += time.perf_counter() - started
+        profile.db_calls += 1
+
+
+def instrument_client(client) -> None:
+    """Time PostgREST round trips made by the Supabase client"""
+    hooks = client.postgrest.session.event_hooks
+    hooks['request'].append(_db_request_started)
+    hooks['response'].append(_db_response_received)
+
+
+# Shared profiler for this worker
+request_profiler = RequestProfiler()
+
+
+class ProfilingMiddleware:
+    """Profile sampled and slow requests; a plain pass-through otherwise"""
+
+    def __init__(self, app, profiler: RequestProfiler = request_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        if not self.profiler.active and not any(name == b'x-profile' for name, _ in scope['headers']):
+            return await self.app(scope, receive, send)
+
+        force = self.profiler.forced(Headers(scope=scope))
+        await self.profiler.profile(self.app, scope, receive, send, force)
@@ -0,0 +1,141 @@
+from config import settings
+from database import iter_pages, newest_first_after, PAGE_SIZE
+from utils.event_hub import audit_event_hub
+from utils.audit_archive import parse_timestamp
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityRecord:
+    """Compact audit event kept in the recent activity buffer"""
+
+    __slots__ = (
+        'id', 'user_id', 'user_email', 'action_type', 'resource_type',
+        'resource_id', 'resource_name', 'school_id', 'created_at'
+    )
+
+    def __init__(self, row: Dict[str, Any]):
+        for field in self.__slots__:
+            setattr(self, field, row.get(field))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class RecentActivityBuffer:
+    """Fixed-size ring of the newest audit events per school, newest first"""
+
+    def __init__(self, capacity: int = settings.recent_activity_size):
+        self.capacity = capacity
+        self._buffers: Dict[str, deque] = {}
+        # Schools whose buffer is known to hold their newest events
+        self._loaded: Set[str] = set()
+
+    def _buffer(self, school_id: str) -> deque:
+        buffer = self._buffers.get(school_id)
+        if buffer is None:
+            buffer = self._buffers[school_id] = deque(maxlen=self.capacity)
+        return buffer
+
+    def record(self, row: Dict[str, Any]) -> None:
+        """Add a newly written audit event"""
+        school_id = row.get('school_id')
+        if school_id:
+            self._buffer(school_id).appendleft(ActivityRecord(row))
+
+    def load(self, school_id: str, rows: List[Dict[str, Any]]) -> None:
+        """Replace a school's buffer with rows ordered newest first.
+
+        Events recorded after the rows were read are kept in front of them.
+        """
+        buffer = self._buffer(school_id)
+        newest = _timestamp(rows[0]['created_at']) if rows else None
+        known = {row['id'] for row in rows}
+        recorded = [
+            record for record in buffer
+            if record.id not in known and (newest is None or _timestamp(record.created_at) > newest)
+        ]
+        buffer.clear()
+        buffer.extend(recorded)
+        buffer.extend(ActivityRecord(row) for row in rows[:self.capacity - len(buffer)])
+        self._loaded.add(school_id)
+
+    def get(self, school_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Return up to limit events, or None if the buffer cannot answer"""
+        if school_id not in self._loaded:
+            return None
+        buffer = self._buffers[school_id]
+        # A full buffer may have evicted older events the caller wants
+        if limit > len(buffer) and len(buffer) == self.capacity:
+            return None
+        return [record.to_dict() for record in list(buffer)[:limit]]
+
+    async def fetch(self, db, school_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Newest events for a school, going to the database only past the buffer.
+
+        The buffer is only touched on the event loop, where the hub records
+        new events; just the database read runs on a thread.
+        """
+        data = self.get(school_id, limit)
+        if data is not None:
+            return data
+
+        def query():
+            return db.table('audit_logs')\
+                .select(', '.join(ActivityRecord.__slots__))\
+                .eq('school_id', school_id)\
+                .order('created_at', desc=True)\
+                .order('id', desc=True)\
+                .limit(max(limit, self.capacity))\
+                .execute()
+
+        result = await asyncio.to_thread(query)
+        self.load(school_id, result.data)
+        return [ActivityRecord(row).to_dict() for row in result.data[:limit]]
+
+    def warm(self, db, max_rows: int = settings.recent_activity_warm_rows) -> None:
+        """Fill buffers from the newest rows of audit_logs"""
+        def page_after(last_row):
+            query = db.table('audit_logs')\
+                .select(', '.join(ActivityRecord.__slots__))\
+                .order('created_at', desc=True)\
+                .order('id', desc=True)
+            if last_row:
+                query = newest_first_after(query, last_row['created_at'], last_row['id'])
+            return query
+
+        rows: List[Dict[str, Any]] = []
+        for page in iter_pages(page_after, min(PAGE_SIZE, max_rows)):
+            rows.extend(page)
+            if len(rows) >= max_rows:
+                saw_everything = False
+                break
+        else:
+            # Ran out of rows, so every school's history has been seen
+            saw_everything = True
+
+        by_school: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            if row.get('school_id'):
+                by_school.setdefault(row['school_id'], []).append(row)
+
+        for school_id, school_rows in by_school.items():
+            if saw_everything or len(school_rows) >= self.capacity:
+                self.load(school_id, school_rows)
+
+        logger.info(f"Recent activity warmed for {len(self._loaded)} schools")
+
+
+def _timestamp(value: Optional[str]) -> datetime:
+    return parse_timestamp(value) if value else datetime.min.replace(tzinfo=timezone.utc)
+
+
+# Shared buffer for this worker, fed by every event the hub delivers so that
+# writes made through other workers reach it too
+recent_activity = RecentActivityBuffer()
+audit_event_hub.add_listener(recent_activity.record)
@@ -0,0 +1,25 @@
+-- ============================================================================
+-- Audit Log Search Index
+-- Migration: 20261019000000_audit_logs_search_index.sql
+-- ============================================================================
+
+-- Trigram matching for substring search (ILIKE '%...%')
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA extensions;
+
+-- Searchable text: user email, resource name (PDF path, exam name) and details
+ALTER TABLE public.audit_logs
+ADD COLUMN IF NOT EXISTS search_text TEXT
+GENERATED ALWAYS AS (
+  lower(
+    coalesce(user_email, '') || ' ' ||
+    coalesce(resource_name, '') || ' ' ||
+    coalesce(details::text, '')
+  )
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_search_text
+  ON public.audit_logs USING GIN (search_text extensions.gin_trgm_ops);
+
+-- Keyset pagination: newest first, id breaks ties
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at_id
+  ON public.audit_logs(created_at DESC, id DESC);
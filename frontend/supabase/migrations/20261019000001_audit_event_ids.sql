@@ -0,0 +1,8 @@
+-- ============================================================================
+-- Audit Event Stream Ids
+-- Migration: 20261019000001_audit_event_ids.sql
+-- ============================================================================
+
+-- Shared ids for events broadcast over LISTEN/NOTIFY, so SSE clients can
+-- resume with Last-Event-ID against any backend worker
+CREATE SEQUENCE IF NOT EXISTS public.audit_event_ids;
@@ -0,0 +1,23 @@
+-- ============================================================================
+-- Dashboard Class Performance
+-- Migration: 20261019000002_dashboard_class_performance.sql
+-- ============================================================================
+
+-- Per-class average percentage and student count for the dashboard, so the
+-- backend reads one row per class instead of every score of the school
+CREATE OR REPLACE FUNCTION public.dashboard_class_performance(_school_id UUID)
+RETURNS TABLE (class_name TEXT, average_percentage NUMERIC, total_students BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT
+    st.class,
+    ROUND(AVG(sc.marks_obtained / sc.max_marks * 100), 1),
+    COUNT(DISTINCT sc.student_id)
+  FROM public.scores sc
+  JOIN public.students st ON st.id = sc.student_id
+  WHERE st.school_id = _school_id
+    AND sc.max_marks > 0
+  GROUP BY st.class
+  ORDER BY st.class;
+$$;
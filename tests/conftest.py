@@ -0,0 +1,151 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Backend modules import each other as top-level modules (config, models, utils...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+
+def _field(row, column):
+    """Resolve a column, including embedded ones such as students.school_id"""
+    for part in column.split('.'):
+        row = row.get(part) if isinstance(row, dict) else None
+    return row
+
+
+OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'gt': lambda a, b: a is not None and a > b,
+    'gte': lambda a, b: a is not None and a >= b,
+    'lt': lambda a, b: a is not None and a < b,
+    'lte': lambda a, b: a is not None and a <= b,
+}
+
+
+def _split_terms(expression):
+    """Split a PostgREST logic expression on commas outside parentheses and quotes"""
+    terms, depth, quoted, current = [], 0, False, ''
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif char == '(' and not quoted:
+            depth += 1
+        elif char == ')' and not quoted:
+            depth -= 1
+        elif char == ',' and not depth and not quoted:
+            terms.append(current)
+            current = ''
+            continue
+        current += char
+    return terms + [current]
+
+
+def _condition(term):
+    if term.startswith(('and(', 'or(')):
+        combine = all if term.startswith('and(') else any
+        conditions = [_condition(t) for t in _split_terms(term[term.index('(') + 1:-1])]
+        return lambda row: combine(c(row) for c in conditions)
+    column, op, value = term.split('.', 2)
+    value = value.strip('"')
+    return lambda row: OPERATORS[op](_field(row, column), value)
+
+
+class FakeTable:
+    """In-memory stand-in for the Supabase query builder over one table.
+
+    Supports the filters, ordering and paging the backend uses, and caps
+    every response at max_rows like PostgREST.
+    """
+
+    max_rows = 1000
+
+    def __init__(self, rows, storage=None):
+        self.rows = rows
+        self.storage = storage
+        self.requests = 0
+        self.deleted = 0
+        # Called before answering a count, to simulate concurrent writes
+        self.on_count = None
+
+    def table(self, name):
+        self._filters = []
+        self._orders = []
+        self._range = None
+        self._limit = None
+        self._delete = False
+        self._head = False
+        return self
+
+    def select(self, *columns, count=None, head=None):
+        self._head = bool(head)
+        return self
+
+    def _filter(self, op, column, value):
+        self._filters.append(lambda row: OPERATORS[op](_field(row, column), value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def or_(self, expression):
+        self._filters.append(_condition(f'or({expression})'))
+        return self
+
+    def order(self, column, desc=False):
+        self._orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def delete(self):
+        self._delete = True
+        return self
+
+    def _matched(self):
+        return [row for row in self.rows if all(f(row) for f in self._filters)]
+
+    def execute(self):
+        self.requests += 1
+        matched = self._matched()
+        if self._delete:
+            self.rows = [row for row in self.rows if row not in matched]
+            self.deleted += len(matched)
+            return type('Result', (), {'data': matched, 'count': None})()
+        if self._head:
+            if self.on_count:
+                self.on_count(self)
+                matched = self._matched()
+            return type('Result', (), {'data': [], 'count': len(matched)})()
+
+        for column, desc in reversed(self._orders):
+            matched.sort(key=lambda row: _field(row, column), reverse=desc)
+        start, end = self._range or (0, len(matched) - 1)
+        if self._limit is not None:
+            end = min(end, start + self._limit - 1)
+        end = min(end, start + self.max_rows - 1)
+        return type('Result', (), {'data': matched[start:end + 1], 'count': None})()
+
+
+@pytest.fixture
+def fake_db():
+    """Factory for FakeTable, e.g. fake_db(rows)"""
+    return FakeTable
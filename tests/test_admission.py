@@ -0,0 +1,166 @@
+import asyncio
+
+import jwt
+from fastapi.routing import APIRoute
+
+from utils import admission
+from utils.admission import AdmissionController, AdmissionMiddleware, DEFAULT, HEAVY
+
+
+def controller(default=60, heavy=2, concurrency=1):
+    return AdmissionController({DEFAULT: default, HEAVY: heavy}, heavy_max_concurrency=concurrency)
+
+
+def http_scope(path, query=b'', headers=(), method='GET'):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query,
+        'headers': list(headers),
+        'client': ('10.0.0.1', 5000),
+    }
+
+
+def test_classify():
+    assert AdmissionController.classify('/api/audit/search') == HEAVY
+    assert AdmissionController.classify('/api/audit/stats') == HEAVY
+    assert AdmissionController.classify('/api/dashboard/s1') == DEFAULT
+    assert AdmissionController.classify('/api/audit/logs') == HEAVY
+    assert AdmissionController.classify('/api/audit/log') == DEFAULT
+    assert AdmissionController.classify('/api/health') is None
+    assert AdmissionController.classify('/api/debug/profiling') is None
+
+
+SECRET = 'test-secret-at-least-32-bytes-long'
+
+
+def bearer(claims, secret=SECRET):
+    return (b'authorization', f"Bearer {jwt.encode(claims, secret, algorithm='HS256')}".encode())
+
+
+def test_heavy_handlers_run_on_the_threadpool():
+    import server
+
+    heavy = [
+        route for route in server.app.routes
+        if isinstance(route, APIRoute) and AdmissionController.classify(route.path) == HEAVY
+    ]
+    assert {route.path for route in heavy} == {'/api/audit/logs', '/api/audit/search', '/api/audit/stats'}
+    # An async handler would block the loop, so only one could ever be in flight
+    assert not any(asyncio.iscoroutinefunction(route.endpoint) for route in heavy)
+
+
+def test_client_key_uses_the_verified_token():
+    limiter = AdmissionController(jwt_secret=SECRET)
+    token = bearer({'sub': 'u1', 'user_metadata': {'school_id': 's1'}})
+
+    assert limiter.client_key(http_scope('/api/audit/log', headers=[token])) == 'school:s1'
+    assert limiter.client_key(http_scope('/api/x', headers=[bearer({'sub': 'u2'})])) == 'user:u2'
+
+
+def test_client_key_ignores_unverified_schools():
+    limiter = AdmissionController(jwt_secret=SECRET)
+    forged = bearer({'sub': 'u1', 'user_metadata': {'school_id': 's1'}}, secret='another-secret-at-least-32-bytes')
+    scope = http_scope('/api/audit/search', b'school_id=s2', headers=[forged, (b'school-id', b's3')])
+
+    assert limiter.client_key(scope) == 'ip:10.0.0.1'
+    assert AdmissionController(jwt_secret='').client_key(http_scope('/api/dashboard/s4')) == 'ip:10.0.0.1'
+
+
+def test_client_address_skips_our_proxies():
+    forwarded = [(b'x-forwarded-for', b'6.6.6.6, 1.2.3.4, 10.0.0.9')]
+
+    assert AdmissionController(proxy_hops=2).client_key(http_scope('/api/x', headers=forwarded)) == 'ip:1.2.3.4'
+    # Without configured proxies the header could be forged, so it is ignored
+    assert AdmissionController(proxy_hops=0).client_key(http_scope('/api/x', headers=forwarded)) == 'ip:10.0.0.1'
+
+
+def test_bucket_rejects_burst_and_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, 'monotonic', lambda: now[0])
+    limiter = controller(heavy=2, concurrency=10)
+
+    assert limiter.admit('school:s1', HEAVY) == (None, None)
+    assert limiter.admit('school:s1', HEAVY) == (None, None)
+    # Two per minute refills one token every 30 seconds
+    assert limiter.admit('school:s1', HEAVY) == (429, 30)
+    # Other schools have their own bucket
+    assert limiter.admit('school:s2', HEAVY) == (None, None)
+
+    now[0] += 30
+    assert limiter.admit('school:s1', HEAVY) == (None, None)
+    assert limiter.counters[HEAVY] == {"admitted": 4, "rate_limited": 1, "overloaded": 0}
+
+
+def test_heavy_concurrency_cap():
+    limiter = controller(heavy=10, concurrency=1)
+
+    assert limiter.admit('school:s1', HEAVY) == (None, None)
+    assert limiter.admit('school:s2', HEAVY) == (503, 1)
+    limiter.release(HEAVY)
+    assert limiter.admit('school:s2', HEAVY) == (None, None)
+    assert limiter.in_flight[HEAVY] == 1
+
+
+def test_idle_buckets_are_pruned(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, 'monotonic', lambda: now[0])
+    limiter = controller()
+    limiter.admit('school:s1', DEFAULT)
+    limiter.release(DEFAULT)
+
+    now[0] += 120
+    limiter.admit('school:s2', DEFAULT)
+    assert limiter.metrics()["tracked_buckets"] == 1
+
+
+def run_middleware(middleware, scope):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return messages
+
+
+def test_middleware_rejects_with_retry_after_and_releases():
+    limiter = controller(heavy=1, concurrency=1)
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(limiter.in_flight[HEAVY])
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+
+    middleware = AdmissionMiddleware(app, limiter)
+    scope = http_scope('/api/audit/search')
+
+    assert run_middleware(middleware, scope)[0]['status'] == 200
+    assert seen == [1]
+    assert limiter.in_flight[HEAVY] == 0
+
+    rejected = run_middleware(middleware, scope)[0]
+    assert rejected['status'] == 429
+    assert (b'retry-after', b'60') in rejected['headers']
+    assert seen == [1]
+
+
+def test_middleware_passes_exempt_and_preflight_requests():
+    limiter = controller(default=1)
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope['type'])
+
+    middleware = AdmissionMiddleware(app, limiter)
+    run_middleware(middleware, http_scope('/api/health'))
+    run_middleware(middleware, http_scope('/api/audit/log', method='OPTIONS'))
+    run_middleware(middleware, {'type': 'lifespan'})
+
+    assert calls == ['http', 'http', 'lifespan']
+    assert limiter.counters[DEFAULT]["admitted"] == 0
@@ -0,0 +1,186 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pyarrow.parquet as pq
+import pytest
+
+from utils.audit_archive import AuditArchive, add_months, month_start
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def row(log_id, created_at, school_id='s1', action_type='view', **extra):
+    return {
+        'id': log_id,
+        'school_id': school_id,
+        'action_type': action_type,
+        'resource_type': 'pdf',
+        'user_email': extra.pop('user_email', f'{log_id}@school.org'),
+        'resource_name': extra.pop('resource_name', f'exams/{log_id}.pdf'),
+        'details': extra.pop('details', {'n': log_id}),
+        'created_at': created_at,
+        **extra,
+    }
+
+
+class FakeBucket:
+    def __init__(self, files=None):
+        self.files = files if files is not None else {}
+        self.lists = 0
+        self.fail_uploads = False
+        self.storage = self
+
+    def from_(self, bucket):
+        return self
+
+    def list(self, prefix, options=None):
+        self.lists += 1
+        search = (options or {}).get('search', '')
+        return [
+            {'name': name, 'metadata': {'size': len(data)}}
+            for name, data in self.files.items() if search in name
+        ]
+
+    def download(self, path):
+        return self.files[path.split('/')[-1]]
+
+    def upload(self, path, data, options=None):
+        if not self.fail_uploads:
+            self.files[path.split('/')[-1]] = data.read_bytes() if isinstance(data, Path) else data
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = AuditArchive(directory=str(tmp_path), bucket='archive', hot_months=3)
+    db = FakeBucket()
+    january = [row(f'1-{n:02d}', f'2025-01-{n + 1:02d}T10:00:00+00:00', school_id='s1' if n % 2 else 's2')
+               for n in range(10)]
+    february = [row(f'2-{n:02d}', f'2025-02-{n + 1:02d}T10:00:00+00:00') for n in range(5)]
+    archive._write_month(db, utc(2025, 1, 1), [january])
+    archive._write_month(db, utc(2025, 2, 1), [february])
+    return archive
+
+
+def test_month_helpers():
+    assert add_months(utc(2025, 11, 1), 3) == utc(2026, 2, 1)
+    assert add_months(utc(2025, 1, 1), -1) == utc(2024, 12, 1)
+    assert month_start(utc(2025, 5, 17, 13, 4)) == utc(2025, 5, 1)
+
+
+def test_months_are_listed_newest_first(archive):
+    assert archive.months() == [utc(2025, 2, 1), utc(2025, 1, 1)]
+
+
+def test_get_logs_pages_across_months(archive):
+    logs = archive.get_logs(None, {}, None, None, limit=4, offset=3)
+    assert [log['id'] for log in logs] == ['2-01', '2-00', '1-09', '1-08']
+    assert logs[0]['details'] == {'n': '2-01'}
+    assert logs[0]['created_at'].startswith('2025-02-02T10:00:00')
+
+
+def test_get_logs_applies_filters_and_dates(archive):
+    logs = archive.get_logs(None, {'school_id': 's2'}, '2025-01-03', '2025-01-08', limit=10, offset=0)
+    assert [log['id'] for log in logs] == ['1-06', '1-04', '1-02']
+
+
+def test_rewriting_a_month_merges_without_duplicates(archive, tmp_path):
+    archive._write_month(FakeBucket(), utc(2025, 2, 1), [[row('2-00', '2025-02-01T10:00:00+00:00')]])
+    assert len(archive.get_logs(None, {}, '2025-02-01', None, limit=100, offset=0)) == 5
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_search_matches_substrings_with_keyset_paging(archive):
+    first = archive.search(None, 'EXAMS/1-', {}, None, 3)
+    assert [log['id'] for log in first] == ['1-09', '1-08', '1-07']
+    last = first[-1]
+    second = archive.search(None, 'exams/1-', {}, (last['created_at'], last['id']), 3)
+    assert [log['id'] for log in second] == ['1-06', '1-05', '1-04']
+
+
+def test_search_matches_non_ascii_details(archive):
+    french = row('3-00', '2025-03-01T10:00:00+00:00', details={'subject': 'Français'})
+    archive._write_month(FakeBucket(), utc(2025, 3, 1), [[french]])
+    assert [log['id'] for log in archive.search(None, 'français', {}, None, 10)] == ['3-00']
+
+
+def test_count_by_groups_cold_rows(archive):
+    counts = archive.count_by(None, ['action_type', 'resource_type'], {'school_id': 's1'})
+    assert counts == {'action_type': {'view': 10}, 'resource_type': {'pdf': 10}}
+
+
+def test_archive_moves_old_months_and_deletes_them(tmp_path, fake_db):
+    archive = AuditArchive(directory=str(tmp_path), bucket='archive', hot_months=1)
+    old = [row(f'old-{n}', f'2025-03-0{n + 1}T10:00:00+00:00') for n in range(3)]
+    current = [row('now', datetime.now(timezone.utc).isoformat())]
+    db = fake_db(old + current, FakeBucket())
+
+    assert archive.archive(db) == 3
+    assert db.rows == current
+    assert list(db.storage.files) == ['audit_logs_2025-03.parquet']
+    assert [log['id'] for log in archive.get_logs(None, {}, None, None, 10, 0)] == ['old-2', 'old-1', 'old-0']
+
+
+def test_archive_streams_a_busy_month_in_row_groups(tmp_path, fake_db, monkeypatch):
+    monkeypatch.setattr('utils.audit_archive.ROW_GROUP_SIZE', 1000)
+    archive = AuditArchive(directory=str(tmp_path), bucket='archive', hot_months=1)
+    rows = [row(f'old-{n:04d}', f'2025-03-01T10:{n // 60 % 60:02d}:{n % 60:02d}+00:00') for n in range(2500)]
+    db = fake_db(rows, FakeBucket())
+
+    assert archive.archive(db) == 2500
+    # Keyset pages of 1000 rows, written as row groups of at most 1000
+    assert pq.ParquetFile(archive._path(utc(2025, 3, 1))).metadata.num_row_groups == 3
+    assert len(archive.get_logs(None, {}, None, None, 3000, 0)) == 2500
+
+
+def test_archive_keeps_hot_rows_if_month_changes_during_copy(tmp_path, fake_db):
+    archive = AuditArchive(directory=str(tmp_path), bucket='archive', hot_months=1)
+    db = fake_db([row(f'old-{n}', f'2025-03-0{n + 1}T10:00:00+00:00') for n in range(3)], FakeBucket())
+    db.on_count = lambda fake: fake.rows.append(row('late', '2025-03-09T10:00:00+00:00'))
+
+    assert archive.archive(db) == 0
+    assert db.deleted == 0
+
+
+def test_archive_refuses_to_run_without_a_bucket(tmp_path, fake_db):
+    archive = AuditArchive(directory=str(tmp_path), bucket='', hot_months=1)
+    db = fake_db([row('old', '2025-03-01T10:00:00+00:00')], FakeBucket())
+
+    assert archive.archive(db) == 0
+    assert db.deleted == 0
+    assert archive.months() == []
+
+
+def test_archive_keeps_hot_rows_if_upload_did_not_land(tmp_path, fake_db):
+    archive = AuditArchive(directory=str(tmp_path), bucket='archive', hot_months=1)
+    db = fake_db([row('old', '2025-03-01T10:00:00+00:00')], FakeBucket())
+    db.storage.fail_uploads = True
+
+    assert archive.archive(db) == 0
+    assert db.deleted == 0
+
+
+def test_archive_skips_while_another_worker_holds_the_lock(tmp_path, fake_db):
+    archive = AuditArchive(directory=str(tmp_path), bucket='archive', hot_months=1)
+    db = fake_db([row('old', '2025-03-01T10:00:00+00:00')], FakeBucket())
+    with archive._archive_lock() as acquired:
+        assert acquired
+        assert AuditArchive(directory=str(tmp_path), bucket='archive').archive(db) == 0
+    assert db.deleted == 0
+
+
+def test_bucket_is_listed_again_when_newest_month_is_missing(tmp_path, monkeypatch):
+    archive = AuditArchive(directory=str(tmp_path), bucket='archive', hot_months=3)
+    bucket = FakeBucket({})
+    archive.months(bucket)
+    archive.months(bucket)
+    assert bucket.lists == 1
+
+    # Another host archived a month after our first sync
+    newest = archive._path(add_months(archive.hot_cutoff(), -1)).name
+    bucket.files[newest] = b'parquet'
+    monkeypatch.setattr('utils.audit_archive.SYNC_RETRY_SECONDS', 0)
+    archive.months(bucket)
+    assert (tmp_path / newest).read_bytes() == b'parquet'
+    assert bucket.lists == 2
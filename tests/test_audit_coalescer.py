@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from datetime import datetime
+
+from utils.audit_coalescer import AuditCoalescer
+
+
+class FakeAuditLogs:
+    """Records updates made through the Supabase query builder"""
+
+    def __init__(self):
+        self.updates = []
+        self.threads = set()
+
+    def table(self, name):
+        return self
+
+    def update(self, payload):
+        self._payload = payload
+        return self
+
+    def eq(self, column, value):
+        self._id = value
+        return self
+
+    def execute(self):
+        self.threads.add(threading.get_ident())
+        self.updates.append((self._id, self._payload))
+
+
+def view_event(user_id='u1', resource_id='exam-1'):
+    return {
+        'user_id': user_id,
+        'action_type': 'view',
+        'resource_type': 'exam',
+        'resource_id': resource_id,
+        'school_id': 's1'
+    }
+
+
+def row(row_id):
+    return {'id': row_id, 'details': {'page': 1}, 'created_at': '2026-10-19T08:00:00+00:00'}
+
+
+def test_key_for_skips_security_actions_and_anonymous_events():
+    coalescer = AuditCoalescer(window_seconds=60, actions='view,login')
+
+    assert coalescer.key_for(view_event()) is not None
+    assert coalescer.key_for({**view_event(), 'action_type': 'login'}) is None
+    assert coalescer.key_for({**view_event(), 'user_id': None}) is None
+    assert AuditCoalescer(window_seconds=0, actions='view').key_for(view_event()) is None
+
+
+def test_repeats_are_absorbed_and_stamped_in_utc():
+    coalescer = AuditCoalescer(window_seconds=60, actions='view')
+    key = coalescer.key_for(view_event())
+
+    assert not coalescer.absorb(key)
+    coalescer.track(key, row('r1'))
+    assert coalescer.absorb(key)
+    assert coalescer.absorb(key)
+
+    (window,) = coalescer.collect(force=True)
+    assert window.count == 3
+    assert datetime.fromisoformat(window.last_seen).utcoffset().total_seconds() == 0
+
+
+def test_collect_only_takes_expired_windows_with_repeats():
+    coalescer = AuditCoalescer(window_seconds=60, actions='view')
+    once = coalescer.key_for(view_event(resource_id='exam-1'))
+    twice = coalescer.key_for(view_event(resource_id='exam-2'))
+    coalescer.track(once, row('r1'))
+    coalescer.track(twice, row('r2'))
+    coalescer.absorb(twice)
+
+    assert coalescer.collect() == []
+    assert [w.row_id for w in coalescer.collect(force=True)] == ['r2']
+    assert coalescer.collect(force=True) == []
+
+
+def test_evicted_windows_are_still_written():
+    coalescer = AuditCoalescer(window_seconds=60, actions='view', max_keys=1)
+    first = coalescer.key_for(view_event(resource_id='exam-1'))
+    coalescer.track(first, row('r1'))
+    coalescer.absorb(first)
+    coalescer.track(coalescer.key_for(view_event(resource_id='exam-2')), row('r2'))
+
+    assert [w.row_id for w in coalescer.collect()] == ['r1']
+
+
+def test_flush_writes_counts_off_the_event_loop():
+    coalescer = AuditCoalescer(window_seconds=60, actions='view')
+    key = coalescer.key_for(view_event())
+    coalescer.track(key, row('r1'))
+    coalescer.absorb(key)
+    db = FakeAuditLogs()
+
+    assert asyncio.run(coalescer.flush(db, force=True)) == 1
+
+    (row_id, payload), = db.updates
+    assert row_id == 'r1'
+    assert payload['details']['page'] == 1
+    assert payload['details']['occurrences'] == 2
+    assert payload['details']['first_seen'] == '2026-10-19T08:00:00+00:00'
+    assert threading.get_ident() not in db.threads
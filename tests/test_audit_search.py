@@ -0,0 +1,38 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from routes.audit import _decode_cursor, _encode_cursor
+from server import app
+
+LOG_ID = '5b6f7a4e-0f1c-4d7e-9a53-2d1f7c3e8b10'
+
+
+def encode(*values):
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+
+def test_cursor_round_trip():
+    cursor = _encode_cursor({'created_at': '2025-01-05T10:00:00.123+00:00', 'id': LOG_ID})
+    assert _decode_cursor(cursor) == ('2025-01-05T10:00:00.123000+00:00', LOG_ID)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-base64!',
+    encode('2025-01-05T10:00:00+00:00'),
+    encode('2025-01-05T10:00:00+00:00",id.gt.0', LOG_ID),
+    encode('2025-01-05T10:00:00+00:00', f'{LOG_ID}),or(id.neq.x'),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize('limit', [0, -1, 1001])
+def test_search_limit_is_bounded(limit):
+    response = TestClient(app).get('/api/audit/search', params={'q': 'math', 'limit': limit})
+    assert response.status_code == 422
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+from routes import dashboard
+from routes.dashboard import _load_performance, _load_section
+
+
+class FakeRpc:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return self
+
+    def execute(self):
+        return type('Result', (), {'data': self.rows})()
+
+
+def test_performance_is_aggregated_in_the_database():
+    db = FakeRpc([
+        {'class_name': '10', 'average_percentage': '80.0', 'total_students': 1500},
+        {'class_name': '9', 'average_percentage': 62.5, 'total_students': 1000},
+    ])
+
+    assert _load_performance(db, 's1') == [
+        {"class": "10", "averagePercentage": 80.0, "totalStudents": 1500},
+        {"class": "9", "averagePercentage": 62.5, "totalStudents": 1000},
+    ]
+    assert db.calls == [('dashboard_class_performance', {'_school_id': 's1'})]
+
+
+def test_slow_section_runs_once_and_fills_the_cache_after_timing_out(monkeypatch):
+    monkeypatch.setattr(dashboard.settings, 'dashboard_section_timeout_seconds', 0.05)
+    monkeypatch.setattr(dashboard, '_cache', {})
+    calls = []
+
+    def slow_read():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        return {"ok": True}
+
+    def slow_loader():
+        return asyncio.to_thread(slow_read)
+
+    async def scenario():
+        key = ("performance", "s1", None)
+        first = await asyncio.gather(*[_load_section("performance", key, slow_loader) for _ in range(3)])
+        again = await _load_section("performance", key, slow_loader)
+        await asyncio.sleep(0.3)
+        cached = await _load_section("performance", key, slow_loader)
+        return first, again, cached
+
+    first, again, cached = asyncio.run(scenario())
+    assert first == [(None, "timed out")] * 3
+    assert again == (None, "timed out")
+    assert cached == ({"ok": True}, None)
+    assert len(calls) == 1
+    assert not dashboard._refreshing
+
+
+def test_failed_section_serves_stale_data(monkeypatch):
+    key = ("stats", "s1", None)
+    monkeypatch.setattr(dashboard, '_cache', {key: (time.monotonic() - 1, {"stale": True})})
+
+    async def broken_loader():
+        raise RuntimeError("database unavailable")
+
+    assert asyncio.run(_load_section("stats", key, broken_loader)) == ({"stale": True}, "database unavailable")
+    assert not dashboard._refreshing
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from utils.event_hub import AuditEventHub, BroadcastBackend, InMemoryBroadcastBackend
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_broadcast_backend_is_abstract():
+    with pytest.raises(TypeError):
+        BroadcastBackend()
+
+
+def test_subscriber_receives_matching_events_only():
+    async def scenario():
+        hub = AuditEventHub(backend=InMemoryBroadcastBackend(), buffer_size=10, replay_size=10)
+        subscription = hub.subscribe({"school_id": "a", "action_type": None})
+        await hub.publish({"school_id": "a", "action_type": "view"})
+        await hub.publish({"school_id": "b", "action_type": "view"})
+        first = await subscription.next_event(0.1)
+        second = await subscription.next_event(0.01)
+        return first, second
+
+    first, second = run(scenario())
+    assert first["school_id"] == "a"
+    assert first["event_id"] == 1
+    assert second is None
+
+
+def test_slow_subscriber_drops_oldest():
+    async def scenario():
+        hub = AuditEventHub(backend=InMemoryBroadcastBackend(), buffer_size=2, replay_size=10)
+        subscription = hub.subscribe()
+        for n in range(5):
+            await hub.publish({"n": n})
+        return subscription, [await subscription.next_event(0.1) for _ in range(2)]
+
+    subscription, events = run(scenario())
+    assert [event["n"] for event in events] == [3, 4]
+    assert subscription.dropped == 3
+
+
+def test_resume_replays_events_after_last_event_id():
+    async def scenario():
+        hub = AuditEventHub(backend=InMemoryBroadcastBackend(), buffer_size=10, replay_size=3)
+        for n in range(5):
+            await hub.publish({"n": n, "school_id": "a"})
+        return list(hub.subscribe({"school_id": "a"}, last_event_id=3).buffer)
+
+    replayed = run(scenario())
+    assert [event["event_id"] for event in replayed] == [4, 5]
+
+
+def test_unsubscribed_clients_stop_receiving():
+    async def scenario():
+        hub = AuditEventHub(backend=InMemoryBroadcastBackend())
+        subscription = hub.subscribe()
+        hub.unsubscribe(subscription)
+        await hub.publish({"n": 1})
+        return subscription
+
+    assert not run(scenario()).buffer
+
+
+def test_stalled_backend_does_not_block_publish():
+    class StalledBackend(InMemoryBroadcastBackend):
+        async def publish(self, event):
+            await asyncio.sleep(10)
+
+    async def scenario():
+        hub = AuditEventHub(backend=StalledBackend(), publish_timeout=0.05)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await hub.publish({"n": 1})
+        return loop.time() - started
+
+    assert run(scenario()) < 1
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils import profiling
+from utils.profiling import ProfilingMiddleware, RequestProfiler
+
+
+def profiled_app(profiler):
+    app = FastAPI()
+
+    @app.get("/block")
+    async def block():
+        time.sleep(0.3)
+        return {"ok": True}
+
+    @app.get("/wait")
+    async def wait():
+        await asyncio.sleep(0.3)
+        return {"ok": True}
+
+    @app.get("/fast")
+    async def fast():
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+    return app
+
+
+def test_inactive_profiler_passes_requests_through(monkeypatch):
+    profiler = RequestProfiler(sample_rate=0, slow_threshold_ms=0)
+    monkeypatch.setattr(profiler, 'profile', None)
+
+    response = TestClient(profiled_app(profiler)).get("/fast", headers={"x-debug-token": "t"})
+
+    assert response.status_code == 200
+    assert len(profiler.records) == 0
+
+
+def test_slow_requests_keep_a_stack_only_when_blocking_the_loop():
+    profiler = RequestProfiler(sample_rate=0, slow_threshold_ms=100)
+    client = TestClient(profiled_app(profiler))
+
+    client.get("/block")
+    client.get("/wait")
+    client.get("/fast")
+
+    blocked, waited = profiler.records
+    assert (blocked["path"], blocked["status_code"], blocked["slow"]) == ("/block", 200, True)
+    assert "in block" in blocked["stack"][-1]
+    assert waited["path"] == "/wait"
+    assert waited["stack"] is None
+
+
+def test_forced_profile_needs_the_debug_token(monkeypatch):
+    monkeypatch.setattr(profiling.settings, 'debug_token', 'secret')
+    profiler = RequestProfiler(sample_rate=0, slow_threshold_ms=0)
+    client = TestClient(profiled_app(profiler))
+
+    client.get("/fast?x=1", headers={"x-profile": "1", "x-debug-token": "wrong"})
+    assert len(profiler.records) == 0
+
+    client.get("/fast?x=1", headers={"x-profile": "1", "x-debug-token": "secret"})
+    (record,) = profiler.records
+    assert record["query"] == "x=1"
+    assert record["slow"] is False
+    assert "cumulative" in record["profile"]
+
+
+def test_non_ascii_debug_token_is_rejected_not_an_error(monkeypatch):
+    import server
+
+    monkeypatch.setattr(profiling.settings, 'debug_token', 'secret')
+    client = TestClient(server.app)
+    headers = {"x-profile": "1", "x-debug-token": "sécret".encode('latin-1')}
+
+    assert client.get("/api/health", headers=headers).status_code == 200
+    assert client.get("/api/debug/profiling", headers=headers).status_code == 403
+    assert client.get("/api/debug/profiling", headers={"x-debug-token": "secret"}).status_code == 200
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from utils.event_hub import AuditEventHub, InMemoryBroadcastBackend
+from utils.recent_activity import RecentActivityBuffer
+
+
+def rows_for(school_id, count, start=0):
+    """Rows ordered newest first, one second apart from start onwards"""
+    newest = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    return [
+        {
+            'id': f'{school_id}-{n}',
+            'school_id': school_id,
+            'created_at': (newest - timedelta(seconds=n)).isoformat()
+        }
+        for n in range(start, start + count)
+    ]
+
+
+def test_get_returns_none_until_school_is_loaded():
+    buffer = RecentActivityBuffer(capacity=3)
+    assert buffer.get('s', 2) is None
+    buffer.load('s', rows_for('s', 2))
+    assert [r['id'] for r in buffer.get('s', 5)] == ['s-0', 's-1']
+
+
+def test_record_keeps_newest_first_and_evicts_oldest():
+    buffer = RecentActivityBuffer(capacity=2)
+    buffer.load('s', [])
+    for row in rows_for('s', 3):
+        buffer.record(row)
+    assert [r['id'] for r in buffer.get('s', 2)] == ['s-2', 's-1']
+    # A full buffer cannot answer for history it may have evicted
+    assert buffer.get('s', 3) is None
+
+
+def test_warm_pages_past_the_response_cap(fake_db):
+    db = fake_db(rows_for('busy', 1500) + rows_for('quiet', 10, start=1500))
+    buffer = RecentActivityBuffer(capacity=50)
+    buffer.warm(db, max_rows=10000)
+    assert db.requests == 2
+    assert len(buffer.get('busy', 50)) == 50
+    assert len(buffer.get('quiet', 50)) == 10
+
+
+def test_warm_leaves_partial_schools_unloaded_when_rows_remain(fake_db):
+    db = fake_db(rows_for('busy', 1000) + rows_for('quiet', 10, start=1000))
+    buffer = RecentActivityBuffer(capacity=50)
+    buffer.warm(db, max_rows=1000)
+    assert buffer.get('busy', 50) is not None
+    assert buffer.get('quiet', 50) is None
+
+
+def test_hub_events_reach_the_buffer():
+    hub = AuditEventHub(backend=InMemoryBroadcastBackend())
+    buffer = RecentActivityBuffer(capacity=5)
+    buffer.load('s', [])
+    hub.add_listener(buffer.record)
+    asyncio.run(hub.publish({'id': 'remote', 'school_id': 's'}))
+    assert [r['id'] for r in buffer.get('s', 5)] == ['remote']
+
+
+def test_fetch_keeps_events_recorded_while_reading_the_database(fake_db):
+    buffer = RecentActivityBuffer(capacity=3)
+    db = fake_db(rows_for('s', 5, start=1))
+    newest = rows_for('s', 1)[0]
+    execute = db.execute
+
+    def execute_then_record():
+        result = execute()
+        # The hub delivers a new event on the loop while this thread reads
+        loop.call_soon_threadsafe(buffer.record, newest)
+        return result
+
+    db.execute = execute_then_record
+
+    async def scenario():
+        nonlocal loop
+        loop = asyncio.get_running_loop()
+        data = await buffer.fetch(db, 's', 3)
+        await asyncio.sleep(0)
+        return data
+
+    loop = None
+    assert [r['id'] for r in asyncio.run(scenario())] == ['s-1', 's-2', 's-3']
+    assert [r['id'] for r in buffer.get('s', 3)] == ['s-0', 's-1', 's-2']